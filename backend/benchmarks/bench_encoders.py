@@ -0,0 +1,94 @@
+"""Speed and ranking parity of the encoder backends against fp32 all-mpnet-base-v2.
+
+For each backend/model it reports query and place encoding time, the resident
+memory the model added, and recall@k of its top-k places per query against the
+reference model on a fixed query set and the recorded nearby places.
+
+Run from backend/:  python -m benchmarks.bench_encoders [--backends torch int8 onnx] [--distilled]
+"""
+import os
+import json
+import time
+import argparse
+
+from rec_engine.encoders import BACKENDS, DEFAULT_MODEL, DISTILLED_MODEL, load_encoder, recall_at_k, score_matrix
+from rec_engine.recommendation_engine import PlacesAPIClient, PlaceRecommender
+from benchmarks.fixtures import load_elements
+
+QUERIES = [
+    "seafood restaurant with outdoor seating", "chicken rice", "coffee", "late night supper",
+    "halal food", "vegetarian", "ramen", "dim sum brunch", "cheap eats near orchard road",
+    "romantic italian dinner", "korean bbq", "thai food", "burger and fries", "indian curry",
+    "bubble tea", "cafe with wifi to work", "western food", "japanese sushi", "malay nasi lemak", "",
+]
+
+
+def _rss_mb():
+    """Resident set size of this process in MB (Linux only, None elsewhere)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except (OSError, ValueError):
+        return None
+
+
+def _describe_places():
+    places = PlacesAPIClient()._process_elements(load_elements('lean', 'nearby'))
+    # _create_place_description doesn't touch the model
+    return [PlaceRecommender._create_place_description(None, place) for place in places]
+
+
+def measure(model_name: str, backend: str, descriptions):
+    rss_before = _rss_mb()
+    started = time.perf_counter()
+    model = load_encoder(model_name, backend)
+    load_s = time.perf_counter() - started
+    rss_after = _rss_mb()
+
+    model.encode(["warmup"], convert_to_numpy=True)
+    started = time.perf_counter()
+    for query in QUERIES:
+        model.encode([query], convert_to_numpy=True)
+    query_ms = (time.perf_counter() - started) / len(QUERIES) * 1000
+
+    started = time.perf_counter()
+    scores = score_matrix(model, QUERIES, descriptions)
+    places_s = time.perf_counter() - started
+
+    return scores, {
+        'model': model_name,
+        'backend': backend,
+        'load_s': load_s,
+        'rss_added_mb': (rss_after - rss_before) if rss_before is not None else None,
+        'query_ms': query_ms,
+        'places_per_s': len(descriptions) / places_s,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--backends', nargs='*', default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument('--distilled', action='store_true', help=f'also try {DISTILLED_MODEL}')
+    parser.add_argument('-k', type=int, default=10)
+    parser.add_argument('--out', help='also write the results as JSON here')
+    args = parser.parse_args()
+
+    descriptions = _describe_places()
+    runs = [(DEFAULT_MODEL, 'torch')] + [(DEFAULT_MODEL, b) for b in args.backends if b != 'torch']
+    if args.distilled:
+        runs += [(DISTILLED_MODEL, b) for b in args.backends]
+
+    reference, results = None, []
+    for model_name, backend in runs:
+        scores, result = measure(model_name, backend, descriptions)
+        if reference is None:
+            reference = scores
+        result[f'recall@{args.k}'] = recall_at_k(reference, scores, args.k)
+        results.append(result)
+        print(f"{model_name:<20}{backend:<7} load {result['load_s']:6.1f}s  query {result['query_ms']:7.2f}ms  "
+              f"{result['places_per_s']:8.0f} places/s  rss +{result['rss_added_mb'] or 0:6.0f}MB  "
+              f"recall@{args.k} {result[f'recall@{args.k}']:.3f}")
+
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,60 @@
+"""Compare the original and lean Overpass query shapes on recorded fixtures.
+
+Reports bytes on the wire (raw and gzip), JSON parse time and
+_process_elements time for the nearby and island-wide responses.
+
+Run from backend/:  python -m benchmarks.bench_overpass_query [--out results.json]
+"""
+import gzip
+import json
+import time
+import argparse
+
+from rec_engine.recommendation_engine import PlacesAPIClient
+from benchmarks.fixtures import AREAS, SHAPES, load_raw
+
+
+def _best_of(fn, repeat: int):
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def run(repeat: int = 5):
+    results = []
+    for area in AREAS:
+        for shape in SHAPES:
+            raw = load_raw(shape, area)
+            client = PlacesAPIClient(lean=(shape == 'lean'))
+            parse_s, data = _best_of(lambda: json.loads(raw), repeat)
+            process_s, places = _best_of(lambda: client._process_elements(data['elements']), repeat)
+            results.append({
+                'area': area,
+                'shape': shape,
+                'elements': len(data['elements']),
+                'places': len(places),
+                'bytes': len(raw),
+                'gzip_bytes': len(gzip.compress(raw, compresslevel=6)),
+                'parse_ms': parse_s * 1000,
+                'process_ms': process_s * 1000,
+            })
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--out', help='also write the results as JSON here')
+    args = parser.parse_args()
+
+    results = run(args.repeat)
+    print(f"{'area':<8}{'shape':<7}{'elements':>10}{'places':>8}{'bytes':>12}{'gzip':>10}{'parse ms':>10}{'proc ms':>9}")
+    for r in results:
+        print(f"{r['area']:<8}{r['shape']:<7}{r['elements']:>10}{r['places']:>8}{r['bytes']:>12}"
+              f"{r['gzip_bytes']:>10}{r['parse_ms']:>10.2f}{r['process_ms']:>9.2f}")
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,113 @@
+"""Microbenchmarks for the recommend pipeline on synthetic Singapore places.
+
+- _process_elements on the island fixture
+- _create_place_description over every place
+- get_recommendations at 50 / 1k / 20k places with every place encoded (no
+  embedding store), what the Overpass path runs
+- rank_all over the same places as rows of the embedding matrix with their BM25
+  index, what the local index path runs, and a first page of the ranked list
+  (distances from the requester, radius cutoff and proximity blend)
+- the distance pass on its own (haversine to every place + proximity blend)
+
+Cold runs above --cold-max places are skipped, encoding 20k places with mpnet
+on a CPU takes minutes.
+
+Run from backend/:  python -m benchmarks.bench_pipeline [--sizes 50 1000 20000] [--out results.json]
+"""
+import json
+import argparse
+
+import numpy as np
+
+from rec_engine.encoders import BACKENDS, DEFAULT_MODEL
+from rec_engine.recommendation_engine import PlacesAPIClient, PlaceRecommender
+from rec_engine.place_index import haversine_m
+from rec_engine.place_table import PlaceTable
+from rec_engine.ranked_lists import RankedList
+from benchmarks.fixtures import load_raw, synthetic_places
+from benchmarks.results import save, timeit
+from benchmarks.bench_encoders import QUERIES
+
+# Orchard Road, distances for the distance-aware runs are measured from here
+ORIGIN = (1.3048, 103.8318)
+
+
+def bench_process_elements(repeat: int) -> dict:
+    data = json.loads(load_raw('lean', 'island'))
+    client = PlacesAPIClient()
+    timing = timeit(lambda: client._process_elements(data['elements']), repeat)
+    return {'stage': '_process_elements', 'places': len(data['elements']), **timing}
+
+
+def bench_descriptions(recommender: PlaceRecommender, places, repeat: int) -> dict:
+    timing = timeit(lambda: [recommender._create_place_description(place) for place in places], repeat)
+    return {'stage': '_create_place_description', 'places': len(places), **timing}
+
+
+def coordinates(places):
+    """lat/lon columns, what the place index holds (the server never reads them from dicts per request)"""
+    return np.array([p['lat'] for p in places]), np.array([p['lon'] for p in places])
+
+
+def bench_distance(recommender: PlaceRecommender, places, repeat: int) -> dict:
+    lats, lons = coordinates(places)
+    scores = np.random.default_rng(0).random(len(places), dtype=np.float32)
+    timing = timeit(lambda: recommender.blend_distance(scores, haversine_m(ORIGIN[0], ORIGIN[1], lats, lons)), repeat)
+    return {'stage': 'distance_blend', 'places': len(places), **timing}
+
+
+def bench_recommendations(recommender: PlaceRecommender, places, repeat: int) -> dict:
+    # each timed call uses the next query so nothing is answered from a warm cache
+    queries_iter = iter([query for query in QUERIES if query][:repeat] * repeat)
+    timing = timeit(lambda: recommender.get_recommendations(places, query=next(queries_iter), top_n=10), repeat)
+    return {'stage': 'get_recommendations_cold', 'places': len(places), **timing}
+
+
+def bench_rank_all(recommender: PlaceRecommender, places, matrix, lexical, repeat: int) -> dict:
+    rows = np.arange(len(places))
+    queries_iter = iter([query for query in QUERIES if query][:repeat] * repeat)
+    timing = timeit(lambda: recommender.rank_all(next(queries_iter), rows, matrix, lexical=lexical), repeat)
+    return {'stage': 'rank_all', 'places': len(places), **timing}
+
+
+def bench_page(recommender: PlaceRecommender, places, matrix, lexical, repeat: int) -> dict:
+    """First page of a ranked list, what a request costs once its list is cached"""
+    order, scores = recommender.rank_all(QUERIES[1], np.arange(len(places)), matrix, lexical=lexical)
+    ranked = RankedList(PlaceTable.from_places([places[i] for i in order]), scores)
+    timing = timeit(lambda: ranked.page({}, 0, 10, *ORIGIN, radius=3000, blend=recommender.blend_distance), repeat)
+    return {'stage': 'ranked_list_page_distance', 'places': len(places), **timing}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', nargs='*', type=int, default=[50, 1000, 20000])
+    parser.add_argument('--cold-max', type=int, default=1000, help='largest size to run cold')
+    parser.add_argument('--model', default=DEFAULT_MODEL)
+    parser.add_argument('--backend', default='torch', choices=BACKENDS)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--distance-weight', type=float, default=0.3, help='proximity blend weight (REC_DISTANCE_WEIGHT)')
+    parser.add_argument('--out', help='also write the results as JSON here')
+    args = parser.parse_args()
+
+    # no cache_dir: cold runs really encode, and nothing is left on disk
+    recommender = PlaceRecommender(args.model, backend=args.backend, distance_weight=args.distance_weight)
+    recommender._encode_query('warmup')
+
+    results = [bench_process_elements(args.repeat)]
+    for size in args.sizes:
+        places = synthetic_places(size)
+        results.append(bench_descriptions(recommender, places, args.repeat))
+        if size <= args.cold_max:
+            results.append(bench_recommendations(recommender, places, args.repeat))
+        matrix = recommender.build_index(places)
+        lexical = recommender.lexical_for(matrix)
+        results.append(bench_rank_all(recommender, places, matrix, lexical, args.repeat))
+        results.append(bench_page(recommender, places, matrix, lexical, args.repeat))
+        results.append(bench_distance(recommender, places, args.repeat))
+
+    print(f"{'stage':<38}{'places':>8}{'best ms':>12}{'median ms':>12}")
+    for r in results:
+        print(f"{r['stage']:<38}{r['places']:>8}{r['best_ms']:>12.2f}{r['median_ms']:>12.2f}")
+    if args.out:
+        save(args.out, 'pipeline', results, model=args.model, backend=args.backend, repeat=args.repeat,
+             distance_weight=args.distance_weight)
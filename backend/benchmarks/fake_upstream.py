@@ -0,0 +1,150 @@
+"""Local stand-in for Overpass and Nominatim that replays the Singapore fixtures.
+
+Overpass (POST /api/interpreter) answers around:, bbox and newer: queries from
+the island fixture, filtering by distance/bbox the way the real server would.
+Nominatim (GET /search, GET /reverse) answers from a small gazetteer.
+
+Point the app at it with OVERPASS_ENDPOINT=http://127.0.0.1:<port>/api/interpreter
+and NOMINATIM_URL=http://127.0.0.1:<port>.
+
+Run from backend/:  python -m benchmarks.fake_upstream [--port 8089] [--latency-ms 200]
+"""
+import re
+import json
+import time
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Tuple
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+from rec_engine.place_index import haversine_m
+from benchmarks.fixtures import load_elements
+
+GAZETTEER = [
+    ('Marina Bay Sands, 10 Bayfront Avenue, Singapore', 1.2834, 103.8607),
+    ('Orchard Road, Singapore', 1.3048, 103.8318),
+    ('Chinatown, Singapore', 1.2836, 103.8443),
+    ('Bugis Junction, Victoria Street, Singapore', 1.2993, 103.8555),
+    ('Tampines Mall, Tampines Central 5, Singapore', 1.3525, 103.9447),
+    ('Jurong East, Singapore', 1.3329, 103.7436),
+    ('Holland Village, Singapore', 1.3112, 103.7958),
+    ('Changi Airport, Singapore', 1.3644, 103.9915),
+]
+OSM_BASE = '2024-05-01T00:00:00Z'
+
+_AROUND = re.compile(r'around:(\d+(?:\.\d+)?),(-?\d+(?:\.\d+)?),(-?\d+(?:\.\d+)?)')
+_BBOX = re.compile(r'nwr\((-?\d+(?:\.\d+)?),(-?\d+(?:\.\d+)?),(-?\d+(?:\.\d+)?),(-?\d+(?:\.\d+)?)\)')
+
+
+class FakeOverpass:
+    """Answers lean Overpass queries from a fixed list of elements"""
+
+    def __init__(self, elements: List[Dict], serve_island: bool = True):
+        self.elements = elements
+        # island-wide (snapshot) queries can be refused to force the per-request Overpass path
+        self.serve_island = serve_island
+        coords = [element.get('center') or element for element in elements]
+        self.lats = np.array([c['lat'] for c in coords], dtype=np.float64)
+        self.lons = np.array([c['lon'] for c in coords], dtype=np.float64)
+
+    def answer(self, query: str) -> Tuple[int, Dict]:
+        around = _AROUND.search(query)
+        bbox = _BBOX.search(query)
+        if around:
+            radius, lat, lon = map(float, around.groups())
+            rows = np.flatnonzero(haversine_m(lat, lon, self.lats, self.lons) <= radius)
+        elif bbox:
+            min_lat, min_lon, max_lat, max_lon = map(float, bbox.groups())
+            if not self.serve_island and (max_lat - min_lat) * (max_lon - min_lon) > 0.01:
+                return 504, {'remark': 'runtime error: fake server refuses island-wide queries'}
+            rows = np.flatnonzero((self.lats >= min_lat) & (self.lats <= max_lat) &
+                                  (self.lons >= min_lon) & (self.lons <= max_lon))
+        else:
+            return 400, {'remark': 'fake server only understands around: and bbox queries'}
+
+        hits = [self.elements[row] for row in rows]
+        if 'newer:' in query:
+            # fixtures never change: nothing edited, every hit still exists
+            hits = [{'type': element['type'], 'id': element['id']} for element in hits]
+        return 200, {'version': 0.6, 'generator': 'fake_upstream', 'osm3s': {'timestamp_osm_base': OSM_BASE},
+                     'elements': hits}
+
+
+def _nominatim_entry(i: int, display_name: str, lat: float, lon: float) -> Dict:
+    return {'place_id': i, 'lat': str(lat), 'lon': str(lon), 'display_name': display_name,
+            'address': {'road': display_name.split(',')[0], 'country': 'Singapore', 'country_code': 'sg'}}
+
+
+def nominatim_search(query: str) -> List[Dict]:
+    query = query.lower()
+    return [_nominatim_entry(i, name, lat, lon) for i, (name, lat, lon) in enumerate(GAZETTEER)
+            if query.split(',')[0].strip() in name.lower()][:1]
+
+
+def nominatim_reverse(lat: float, lon: float) -> Dict:
+    lats = np.array([entry[1] for entry in GAZETTEER])
+    lons = np.array([entry[2] for entry in GAZETTEER])
+    i = int(np.argmin(haversine_m(lat, lon, lats, lons)))
+    return _nominatim_entry(i, *GAZETTEER[i])
+
+
+def make_handler(overpass: FakeOverpass, latency_ms: float):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'  # keep-alive, like the real services
+
+        def _send(self, status: int, body):
+            payload = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_POST(self):
+            query = self.rfile.read(int(self.headers.get('Content-Length', 0))).decode('utf-8')
+            if query.startswith('data='):
+                query = parse_qs(query)['data'][0]
+            if latency_ms:
+                time.sleep(latency_ms / 1000)
+            self._send(*overpass.answer(query))
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            params = {key: values[0] for key, values in parse_qs(url.query).items()}
+            if url.path.startswith('/search'):
+                self._send(200, nominatim_search(params.get('q', '')))
+            elif url.path.startswith('/reverse'):
+                self._send(200, nominatim_reverse(float(params['lat']), float(params['lon'])))
+            else:
+                self._send(404, {'error': 'not found'})
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def start(port: int = 0, latency_ms: float = 0, serve_island: bool = True) -> Tuple[ThreadingHTTPServer, str]:
+    """Serve in a background thread, returns (server, base url); server.shutdown() stops it"""
+    overpass = FakeOverpass(load_elements('lean', 'island'), serve_island)
+    server = ThreadingHTTPServer(('127.0.0.1', port), make_handler(overpass, latency_ms))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='fake-upstream', daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_port}'
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--latency-ms', type=float, default=0, help='added to every Overpass answer')
+    parser.add_argument('--no-island', action='store_true', help='refuse island-wide snapshot queries')
+    args = parser.parse_args()
+    server, url = start(args.port, args.latency_ms, not args.no_island)
+    print(f'Fake Overpass: {url}/api/interpreter  Nominatim: {url}')
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
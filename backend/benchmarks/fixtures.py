@@ -0,0 +1,183 @@
+"""Overpass response fixtures for the benchmarks.
+
+None are checked in: unless you record them, every fixture is a seeded synthetic
+Singapore-like response, and the "full" shape is a hand-written approximation of
+what the original query returns. Results files say which ones a run used
+(environment.fixtures). Recordings go to benchmarks/fixtures/<shape>_<area>.json
+and are picked up instead of the synthetic data.
+
+Record fresh ones from backend/:  python -m benchmarks.fixtures --record
+"""
+import os
+import json
+import random
+import argparse
+from typing import Dict, List
+
+from rec_engine.recommendation_engine import SINGAPORE_BBOX, PlacesAPIClient
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+PLACES_TYPE = ["amenity=restaurant", "amenity=cafe"]
+SHAPES = ('full', 'lean')
+# area -> (centre used for nearby searches, number of synthetic places)
+AREAS = {
+    'nearby': ((1.2837, 103.8607), 600),
+    'island': ((1.3521, 103.8198), 12000),
+}
+
+_CUISINES = ['chinese', 'coffee_shop', 'japanese', 'indian', 'malay', 'seafood', 'thai', 'korean',
+             'western', 'italian', 'vegetarian', 'ramen', 'burger', 'dim_sum', 'halal']
+_STREETS = ['Orchard Road', 'Marina Gardens Drive', 'Upper Circular Road', 'Bukit Timah Road',
+            'Tanjong Pagar Road', 'Jalan Besar', 'Geylang Road', 'Holland Avenue', 'Tampines Street 81']
+# tags OSM carries that nothing in the app reads
+_NOISE_TAGS = {
+    'source': 'survey', 'check_date': '2024-05-01', 'brand:wikidata': 'Q123456',
+    'name:zh': '餐厅', 'name:en': 'Restaurant', 'level': '1', 'toilets': 'no',
+}
+
+
+def _place_tags(rng: random.Random, i: int) -> Dict[str, str]:
+    tags = {
+        'amenity': rng.choice(['restaurant', 'restaurant', 'cafe']),
+        'name': f"{rng.choice(['Golden', 'Red', 'Happy', 'Ah', 'Lucky', 'Old'])} {rng.choice(['Wok', 'House', 'Kopi', 'Kitchen', 'Bistro'])} {i}",
+        'cuisine': rng.choice(_CUISINES),
+    }
+    if rng.random() < 0.6:
+        tags.update({'addr:street': rng.choice(_STREETS), 'addr:housenumber': str(rng.randint(1, 400)),
+                     'addr:postcode': f'{rng.randint(10000, 829999):06d}', 'addr:city': 'Singapore'})
+    for key, value in (('opening_hours', 'Mo-Su 10:00-22:00'), ('website', f'https://example.sg/{i}'),
+                       ('phone', '+65 6123 4567'), ('outdoor_seating', 'yes'), ('wheelchair', 'yes'),
+                       ('reservation', 'yes'), ('takeaway', 'yes')):
+        if rng.random() < 0.3:
+            tags[key] = value
+    for key, value in _NOISE_TAGS.items():
+        if rng.random() < 0.4:
+            tags[key] = value
+    return tags
+
+
+def synthetic_elements(area: str, seed: int = 42, count: int = None) -> List[Dict]:
+    """Matched elements (nodes with coords, ways with member node ids + center) for an area"""
+    (lat, lon), default_count = AREAS[area]
+    count = count or default_count
+    spread = 0.025 if area == 'nearby' else 0.15
+    rng = random.Random(seed)
+    elements = []
+    for i in range(count):
+        tags = _place_tags(rng, i)
+        if rng.random() < 0.08:
+            tags.pop('name')  # unnamed places exist and get dropped
+        p_lat, p_lon = lat + rng.uniform(-spread, spread), lon + rng.uniform(-spread, spread)
+        if rng.random() < 0.8:
+            elements.append({'type': 'node', 'id': 1000000 + i, 'lat': p_lat, 'lon': p_lon, 'tags': tags})
+        else:
+            members = [{'type': 'node', 'id': 9000000 + i * 20 + j,
+                        'lat': p_lat + rng.uniform(-1e-4, 1e-4), 'lon': p_lon + rng.uniform(-1e-4, 1e-4)}
+                       for j in range(rng.randint(4, 14))]
+            elements.append({'type': 'way', 'id': 2000000 + i, 'center': {'lat': p_lat, 'lon': p_lon},
+                             'nodes': [m['id'] for m in members], 'tags': tags, '_members': members})
+    return elements
+
+
+def full_response(elements: List[Dict]) -> Dict:
+    """What the original query (node/way/relation, out body, >; out skel qt) returns"""
+    out, skel = [], []
+    for element in elements:
+        element = dict(element)
+        members = element.pop('_members', [])
+        element.pop('center', None)  # out body without center
+        out.append(element)
+        skel.extend(members)
+    return {'version': 0.6, 'generator': 'fixture', 'elements': out + skel}
+
+
+def lean_response(elements: List[Dict]) -> Dict:
+    """What the lean query (nwr, nodes out body, ways out tags center) returns"""
+    nodes, ways = [], []
+    for element in elements:
+        if element['type'] == 'node':
+            nodes.append(element)
+        else:
+            ways.append({'type': element['type'], 'id': element['id'],
+                         'center': element['center'], 'tags': element['tags']})
+    return {'version': 0.6, 'generator': 'fixture', 'elements': nodes + ways}
+
+
+def fixture_path(shape: str, area: str) -> str:
+    return os.path.join(FIXTURE_DIR, f'{shape}_{area}.json')
+
+
+def load_raw(shape: str, area: str) -> bytes:
+    """Response body bytes for shape/area, recorded if available else synthetic"""
+    path = fixture_path(shape, area)
+    if os.path.exists(path):
+        with open(path, 'rb') as f:
+            return f.read()
+    elements = synthetic_elements(area)
+    response = full_response(elements) if shape == 'full' else lean_response(elements)
+    return json.dumps(response).encode('utf-8')
+
+
+def fixture_sources() -> Dict[str, str]:
+    """'<shape>_<area>' -> 'recorded' or 'synthetic', for labelling results"""
+    return {f'{shape}_{area}': 'recorded' if os.path.exists(fixture_path(shape, area)) else 'synthetic'
+            for shape in SHAPES for area in AREAS}
+
+
+def load_elements(shape: str = 'lean', area: str = 'island') -> List[Dict]:
+    return json.loads(load_raw(shape, area))['elements']
+
+
+def synthetic_places(count: int, seed: int = 42) -> List[Dict]:
+    """Exactly count island-wide places, as _process_elements returns them"""
+    # ~8% of synthetic elements are unnamed and get dropped, generate a few extra
+    elements = lean_response(synthetic_elements('island', seed, int(count * 1.15) + 10))['elements']
+    return PlacesAPIClient()._process_elements(elements)[:count]
+
+
+def original_sg_query(places_type: List[str]) -> str:
+    """The island-wide query as the app first sent it (out body without center, then >; out skel).
+
+    _build_bbox_query(lean=False) has since gained a center, recording with it
+    would make the "full" fixture smaller than what the original query returned.
+    """
+    bbox = ','.join(str(c) for c in SINGAPORE_BBOX)
+    queries = []
+    for place in places_type:
+        k, v = place.split('=', 1)
+        queries.append(f'node["{k}"="{v}"]({bbox});\nway["{k}"="{v}"]({bbox});\nrelation["{k}"="{v}"]({bbox});')
+    return "\n".join(["[out:json][timeout:60];", "(", *queries, ");", "out body;", ">;", "out skel qt;"])
+
+
+def record(areas=tuple(AREAS)):
+    """Save live Overpass responses for both query shapes"""
+    os.makedirs(FIXTURE_DIR, exist_ok=True)
+    for shape in SHAPES:
+        client = PlacesAPIClient(lean=(shape == 'lean'))
+        for area in areas:
+            if area == 'nearby':
+                # unchanged from the original with lean=False
+                (lat, lon), _ = AREAS[area]
+                query = client._build_overpass_query(lat, lon, 3000, PLACES_TYPE, limit=1000)
+            elif shape == 'full':
+                query = original_sg_query(PLACES_TYPE)
+            else:
+                query = client._build_sg_query(PLACES_TYPE, limit=None)
+            response = client.session.post(client.overpass_endpoint, data=query,
+                                           headers={'Content-Type': 'text/plain'}, timeout=180)
+            response.raise_for_status()
+            with open(fixture_path(shape, area), 'wb') as f:
+                f.write(response.content)
+            print(f'Recorded {shape}_{area}: {len(response.content)} bytes')
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--record', action='store_true', help='fetch fresh fixtures from Overpass')
+    args = parser.parse_args()
+    if args.record:
+        record()
+    else:
+        for shape in SHAPES:
+            for area in AREAS:
+                print(f'{shape}_{area}: {len(load_raw(shape, area))} bytes')
@@ -0,0 +1,178 @@
+"""Load test /api/recommend against a local server backed by the fake upstream.
+
+Starts benchmarks.fake_upstream and `uvicorn main:app` in a subprocess (own
+REC_DATA_DIR, result and ranked list caches off unless --cache), waits for /readyz, then fires
+requests from --concurrency clients for --duration seconds and reports
+throughput, p50/p95/p99 latency and the mean time per pipeline stage.
+
+Stage means come from /metrics, which each uvicorn worker keeps for itself: with
+--workers > 1 they are whichever worker answered the scrape (a sample, not the total).
+
+--mode index    the server builds its island snapshot from the fake Overpass
+--mode overpass the fake refuses island-wide queries, every request goes to Overpass
+
+Run from backend/:  python -m benchmarks.load_test [--mode index] [--concurrency 16] [--duration 30] [--out results.json]
+"""
+import os
+import re
+import sys
+import time
+import socket
+import random
+import asyncio
+import argparse
+import tempfile
+import subprocess
+from typing import Dict, List
+
+import httpx
+import numpy as np
+
+from benchmarks import fake_upstream
+from benchmarks.results import save
+from benchmarks.bench_encoders import QUERIES
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_STAGE_LINE = re.compile(r'rec_stage_seconds_(sum|count)\{stage="([^"]+)"\} (\S+)')
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(port: int, upstream: str, data_dir: str, args) -> subprocess.Popen:
+    env = dict(os.environ,
+               REC_DATA_DIR=data_dir,
+               OVERPASS_ENDPOINT=f'{upstream}/api/interpreter',
+               NOMINATIM_URL=upstream,
+               REC_RESULT_CACHE_SIZE=os.getenv('REC_RESULT_CACHE_SIZE', '2000') if args.cache else '0',
+               REC_RANKED_LIST_CACHE_MB=os.getenv('REC_RANKED_LIST_CACHE_MB', '64') if args.cache else '0')
+    command = [sys.executable, '-m', 'uvicorn', 'main:app', '--port', str(port),
+               '--workers', str(args.workers), '--log-level', 'warning']
+    return subprocess.Popen(command, cwd=BACKEND_DIR, env=env)
+
+
+def wait_ready(base: str, mode: str, timeout: float, server: subprocess.Popen):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if server.poll() is not None:
+            sys.exit(f'❌ Server exited with {server.returncode}')
+        try:
+            body = httpx.get(f'{base}/readyz', timeout=2).json()
+            published = any(region['published'] for region in body.get('regions', {}).values())
+            if body.get('ready') and (mode != 'index' or published):
+                return body
+        except (httpx.HTTPError, ValueError):
+            pass
+        time.sleep(1)
+    sys.exit(f'❌ Server not ready after {timeout:.0f}s')
+
+
+def stage_totals(base: str) -> Dict[str, List[float]]:
+    """{stage: [sum seconds, count]} scraped from /metrics"""
+    totals: Dict[str, List[float]] = {}
+    for kind, name, value in _STAGE_LINE.findall(httpx.get(f'{base}/metrics', timeout=10).text):
+        totals.setdefault(name, [0.0, 0.0])[0 if kind == 'sum' else 1] = float(value)
+    return totals
+
+
+def make_request(rng: random.Random, top_n: int) -> Dict:
+    """A query near one of the gazetteer landmarks, jittered by up to ~500 m"""
+    _, lat, lon = rng.choice(fake_upstream.GAZETTEER)
+    return {'lat': lat + rng.uniform(-0.0045, 0.0045), 'lon': lon + rng.uniform(-0.0045, 0.0045),
+            'query': rng.choice(QUERIES), 'top_n': top_n}
+
+
+async def run_load(base: str, concurrency: int, duration: float, top_n: int, seed: int):
+    latencies: List[float] = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def client_loop(client: httpx.AsyncClient, rng: random.Random):
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                response = await client.get(f'{base}/api/recommend', params=make_request(rng, top_n))
+                ok = response.status_code == 200
+            except httpx.HTTPError:
+                ok = False
+            if ok:
+                latencies.append(time.perf_counter() - started)
+            else:
+                errors += 1
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(timeout=120, limits=limits) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(client_loop(client, random.Random(seed + i)) for i in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return latencies, errors, elapsed
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> Dict:
+    ms = np.array(latencies) * 1000 if latencies else np.zeros(1)
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {'requests': len(latencies), 'errors': errors, 'rps': len(latencies) / elapsed,
+            'p50_ms': float(p50), 'p95_ms': float(p95), 'p99_ms': float(p99), 'max_ms': float(ms.max())}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--mode', default='index', choices=['index', 'overpass'])
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=30, help='seconds of measured load')
+    parser.add_argument('--warmup', type=float, default=5, help='seconds of unmeasured load first')
+    parser.add_argument('--workers', type=int, default=1, help='uvicorn workers')
+    parser.add_argument('--overpass-latency-ms', type=float, default=0, help='added to every fake Overpass answer')
+    parser.add_argument('--cache', action='store_true', help='keep the response and ranked list caches on')
+    parser.add_argument('--top-n', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--startup-timeout', type=float, default=900)
+    parser.add_argument('--out', help='also write the results as JSON here')
+    args = parser.parse_args()
+
+    upstream_server, upstream = fake_upstream.start(latency_ms=args.overpass_latency_ms,
+                                                    serve_island=args.mode == 'index')
+    port = _free_port()
+    base = f'http://127.0.0.1:{port}'
+    with tempfile.TemporaryDirectory(prefix='rec-load-') as data_dir:
+        server = start_server(port, upstream, data_dir, args)
+        try:
+            ready = wait_ready(base, args.mode, args.startup_timeout, server)
+            published = [name for name, region in ready.get('regions', {}).items() if region['published']]
+            print(f"Ready: regions {published or 'none'} published, mode={args.mode}")
+            if args.warmup:
+                asyncio.run(run_load(base, args.concurrency, args.warmup, args.top_n, args.seed + 1000))
+            before = stage_totals(base)
+            latencies, errors, elapsed = asyncio.run(
+                run_load(base, args.concurrency, args.duration, args.top_n, args.seed))
+            after = stage_totals(base)
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+            upstream_server.shutdown()
+
+    result = summarize(latencies, errors, elapsed)
+    result['mode'] = args.mode
+    stages = []
+    for name, (total, count) in sorted(after.items()):
+        prev_total, prev_count = before.get(name, (0.0, 0.0))
+        if count > prev_count:
+            stages.append({'stage': name, 'calls': int(count - prev_count),
+                           'mean_ms': (total - prev_total) / (count - prev_count) * 1000})
+
+    print(f"{result['requests']} requests, {result['errors']} errors, {result['rps']:.1f} req/s")
+    print(f"p50 {result['p50_ms']:.1f} ms  p95 {result['p95_ms']:.1f} ms  "
+          f"p99 {result['p99_ms']:.1f} ms  max {result['max_ms']:.1f} ms")
+    if args.workers > 1:
+        print(f"stage times below are from one of the {args.workers} workers")
+    for row in stages:
+        print(f"  {row['stage']:<18}{row['calls']:>8} calls{row['mean_ms']:>10.2f} ms")
+    if args.out:
+        save(args.out, 'load_test', [result, *stages], mode=args.mode, concurrency=args.concurrency,
+             duration=args.duration, workers=args.workers, cache=args.cache,
+             stages_from='one worker' if args.workers > 1 else 'all',
+             overpass_latency_ms=args.overpass_latency_ms)
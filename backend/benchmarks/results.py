@@ -0,0 +1,86 @@
+"""Shared JSON result format for the benchmarks, and a side-by-side diff of two runs.
+
+Every file is {"benchmark": ..., "environment": {...}, "results": [{...}, ...]}.
+
+Compare from backend/:  python -m benchmarks.results before.json after.json
+"""
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import statistics
+import subprocess
+from typing import Callable, Dict, List
+
+import numpy as np
+
+
+def timeit(fn: Callable, repeat: int = 5) -> Dict[str, float]:
+    """Best and median wall time of fn() over repeat runs, in ms"""
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - started) * 1000)
+    return {'best_ms': min(times), 'median_ms': statistics.median(times)}
+
+
+def environment() -> Dict:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    from benchmarks.fixtures import fixture_sources
+    return {
+        'commit': commit,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        # synthetic unless benchmarks/fixtures has recordings, numbers from the two don't compare
+        'fixtures': fixture_sources(),
+    }
+
+
+def save(path: str, benchmark: str, results: List[Dict], **settings):
+    with open(path, 'w') as f:
+        json.dump({'benchmark': benchmark, 'environment': environment(), 'settings': settings,
+                   'results': results}, f, indent=2)
+    print(f'Saved {len(results)} results -> {path}')
+
+
+def _key(row: Dict) -> tuple:
+    """Rows are matched on their non-numeric fields (area, size, stage...)"""
+    return tuple((k, v) for k, v in sorted(row.items()) if not isinstance(v, (int, float)) or isinstance(v, bool))
+
+
+def compare(before: Dict, after: Dict):
+    print(f"{before['benchmark']}: {before['environment'].get('commit')} -> {after['environment'].get('commit')}")
+    if before['environment'].get('fixtures') != after['environment'].get('fixtures'):
+        print('  ❌ the runs used different fixtures (recorded vs synthetic), ratios are not comparable')
+    old_rows = {_key(row): row for row in before['results']}
+    for row in after['results']:
+        old = old_rows.get(_key(row))
+        label = ' '.join(str(v) for _, v in _key(row))
+        if old is None:
+            print(f'  {label}: new')
+            continue
+        for field, value in row.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool) and old.get(field):
+                print(f'  {label:<40}{field:<16}{old[field]:>12.3f} -> {value:>12.3f}  ({value / old[field]:.2f}x)')
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('before')
+    parser.add_argument('after')
+    args = parser.parse_args()
+    with open(args.before) as f_before, open(args.after) as f_after:
+        before, after = json.load(f_before), json.load(f_after)
+    if before['benchmark'] != after['benchmark']:
+        sys.exit(f"Different benchmarks: {before['benchmark']} vs {after['benchmark']}")
+    compare(before, after)
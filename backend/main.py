@@ -1,11 +1,396 @@
 #FastAPI entry point
-from fastapi import FastAPI, Query
-from rec_engine.recommendation_engine import PlacesAPIClient, PlaceRecommender
+import time
+_process_started = time.perf_counter()
+
+import os
+import asyncio
+import threading
+import json
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+import numpy as np
+from fastapi import FastAPI, Query, HTTPException
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field
+from starlette.concurrency import run_in_threadpool
+from rec_engine.recommendation_engine import PlaceRecommender
+from rec_engine.async_client import AsyncPlacesAPIClient
+from rec_engine.geotile_cache import GeotileCache, geohash_encode
+from rec_engine.place_index import PlaceIndex, haversine_m
+from rec_engine.place_table import PlaceTable
+from rec_engine.ingest import index_path, snapshot_region, update_region
+from rec_engine.regions import DEFAULT_REGIONS, Region, RegionRegistry, Shard, parse_regions
+from rec_engine.filters import AMENITY_FLAGS, FilterColumns
+from rec_engine.result_cache import ResultCache, normalize_query
+from rec_engine.ranked_lists import RankedList, RankedListCache, decode_cursor, encode_cursor
+from rec_engine.geocode_cache import GeocodeCache
+from rec_engine import shared_index
+from rec_engine.metrics import REGISTRY, Gauge, Histogram, collect_timings, server_timing, stage
 from fastapi.middleware.cors import CORSMiddleware
 
-app = FastAPI()
-client = PlacesAPIClient()
-recommender = PlaceRecommender()
+# Local caches (embeddings, place snapshot etc.) live here, override with REC_DATA_DIR
+DATA_DIR = os.getenv("REC_DATA_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data"))
+EMBEDDING_DIR = os.path.join(DATA_DIR, "embeddings")
+# Each region gets its own snapshot (places_<name>.json) and shard: index + embedding
+# matrix as memory-mapped files under shared_index/<name>/, shared by every uvicorn worker
+REGIONS = parse_regions(os.getenv("REC_REGIONS") or DEFAULT_REGIONS)
+SHARED_INDEX_DIR = os.path.join(DATA_DIR, "shared_index")
+# Shards are mapped on a region's first request; least recently used ones are dropped over this
+SHARD_MEMORY_BUDGET = int(float(os.getenv("REC_SHARD_MEMORY_MB", "2048")) * 1e6)
+# Pull OSM edits since the last sync once the index is older than this...
+PLACE_INDEX_MAX_AGE = float(os.getenv("PLACE_INDEX_MAX_AGE_HOURS", "24")) * 3600
+# ...and re-pull the whole island (moved way centres, anything missed) this often
+PLACE_INDEX_REBUILD_AGE = float(os.getenv("PLACE_INDEX_REBUILD_DAYS", "7")) * 24 * 3600
+SEARCH_RADIUS = 3000
+# Most places one request (or page) may ask for
+MAX_TOP_N = 50
+# Scores are blended with proximity: (1 - weight) * similarity + weight * exp(-distance / decay),
+# REC_DISTANCE_WEIGHT=0 ranks on similarity alone
+DISTANCE_WEIGHT = float(os.getenv("REC_DISTANCE_WEIGHT", "0.3"))
+DISTANCE_DECAY_M = float(os.getenv("REC_DISTANCE_DECAY_M", "1000"))
+PLACES_TYPE = ["amenity=restaurant", "amenity=cafe"]
+# Concurrent requests share batched query encodes, REC_BATCH_WAIT_MS=0 turns batching off
+BATCH_WAIT_MS = float(os.getenv("REC_BATCH_WAIT_MS", "5"))
+# Address of a `python -m rec_engine.inference_server` process; when set, workers don't load the model
+ENCODER_ADDRESS = os.getenv("REC_ENCODER_ADDRESS")
+# BM25 word matches are ranked ahead of the rest of the radius, REC_LEXICAL_CANDIDATES=0 ranks densely
+LEXICAL_CANDIDATES = int(os.getenv("REC_LEXICAL_CANDIDATES", "300"))
+LEXICAL_WEIGHT = float(os.getenv("REC_LEXICAL_WEIGHT", "0.2"))
+# Repeated /api/recommend calls (same ~100 m cell, query, filters, top_n) are served from memory,
+# REC_RESULT_CACHE_SIZE=0 turns this off
+RESULT_CACHE_SIZE = int(os.getenv("REC_RESULT_CACHE_SIZE", "2000"))
+RESULT_CACHE_TTL = float(os.getenv("REC_RESULT_CACHE_TTL", "600"))
+RESULT_CACHE_GRID_M = float(os.getenv("REC_RESULT_CACHE_GRID_M", "100"))
+# Every candidate of a search stays ranked in memory for a while, so next pages (cursor) and
+# filter changes are sliced from it instead of re-ranked. REC_RANKED_LIST_CACHE_MB=0 turns this off
+RANKED_LIST_CACHE_BYTES = int(float(os.getenv("REC_RANKED_LIST_CACHE_MB", "64")) * 1e6)
+RANKED_LIST_TTL = float(os.getenv("REC_RANKED_LIST_TTL", "300"))
+# Addresses are geocoded through Nominatim (1 req/s) once and then served from this file
+GEOCODE_CACHE_PATH = os.path.join(DATA_DIR, "geocode_cache.jsonl")
+GEOCODE_CACHE_TTL = float(os.getenv("REC_GEOCODE_CACHE_DAYS", "30")) * 24 * 3600
+# Send per-stage timings back in a Server-Timing header (shows up in the browser's network tab)
+SERVER_TIMING = os.getenv("REC_SERVER_TIMING", "1") == "1"
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # the model and the indexes load (and the leader gets claimed) in the background, the server binds straight away
+    threading.Thread(target=_refresh_loop, name="model-and-index", daemon=True).start()
+    yield
+    await client.aclose()
+
+
+app = FastAPI(lifespan=lifespan)
+# Async client for request handlers; its sync methods are used by the background refresher.
+# Nearby Overpass fallbacks are cached per geohash tile so neighbouring users share results.
+client = AsyncPlacesAPIClient(os.getenv("OVERPASS_ENDPOINT", "https://overpass-api.de/api/interpreter"),
+                              tile_cache=GeotileCache())
+# coordinates are reverse geocoded from the place index's addresses once one is loaded
+client.geocoder.cache = GeocodeCache(GEOCODE_CACHE_PATH, GEOCODE_CACHE_TTL)
+# Emptied whenever a different place index is swapped in
+result_cache = ResultCache(RESULT_CACHE_SIZE, RESULT_CACHE_TTL, RESULT_CACHE_GRID_M)
+ranked_lists = RankedListCache(RANKED_LIST_CACHE_BYTES, RANKED_LIST_TTL, RESULT_CACHE_GRID_M)
+
+# The model (torch import + weights) and the place index are loaded in the
+# background after the server binds, /readyz reports when they're usable.
+recommender: Optional[PlaceRecommender] = None
+model_ready = threading.Event()
+# One worker (the leader) refreshes every region and publishes it to SHARED_INDEX_DIR,
+# the others only map what it published last
+is_leader = False
+# last published version seen per region name
+shared_versions: Dict[str, str] = {}
+_leader_lock = None
+# per region name: when the leader last tried to refresh it and what that failed with (None = it worked)
+refresh_status: Dict[str, Dict] = {}
+# last exception that escaped an iteration of the background loop, reported by /readyz
+loop_error: Optional[Dict] = None
+# seconds spent in each startup phase, reported by /readyz
+startup_phases = {"imports": round(time.perf_counter() - _process_started, 3)}
+
+
+def _timed(phase: str, fn, *args, **kwargs):
+    started = time.perf_counter()
+    result = fn(*args, **kwargs)
+    startup_phases[phase] = round(time.perf_counter() - started, 3)
+    return result
+
+
+def claim_leadership() -> bool:
+    """True if this worker holds (or just took) DATA_DIR/index.lock, released when the process exits"""
+    global _leader_lock
+    if _leader_lock is not None:
+        return True
+    try:
+        import fcntl
+    except ImportError:
+        return True  # no flock (Windows): every worker keeps its own index up to date
+    os.makedirs(DATA_DIR, exist_ok=True)
+    lock = open(os.path.join(DATA_DIR, "index.lock"), "w")
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock.close()
+        return False
+    _leader_lock = lock
+    return True
+
+
+def load_recommender():
+    """Load the model and run a warmup encode so the first real request isn't slow"""
+    global recommender
+    model = _timed("model_load", PlaceRecommender,
+        model_name=os.getenv("REC_MODEL", "all-mpnet-base-v2"),
+        backend=os.getenv("REC_ENCODER_BACKEND", "torch"),
+        encoder_address=ENCODER_ADDRESS,
+        # the on-disk embedding store isn't safe for concurrent writers, only the leader encodes places in bulk
+        cache_dir=EMBEDDING_DIR if is_leader else None,
+        batch_queries=BATCH_WAIT_MS > 0,
+        max_wait_ms=BATCH_WAIT_MS,
+        max_batch_size=int(os.getenv("REC_MAX_BATCH", "32")),
+        lexical_candidates=LEXICAL_CANDIDATES,
+        lexical_weight=LEXICAL_WEIGHT,
+        distance_weight=DISTANCE_WEIGHT,
+        distance_decay_m=DISTANCE_DECAY_M,
+    )
+    _timed("warmup", model._encode_query, "warmup")
+    recommender = model
+    model_ready.set()
+
+
+def shared_root(region: Region) -> str:
+    return os.path.join(SHARED_INDEX_DIR, region.name)
+
+
+def load_shard(region: Region) -> Optional[Shard]:
+    """Map the region's last published index + matrix and build its lexical index, None before the first publish"""
+    loaded = shared_index.load(shared_root(region), recommender.namespace)
+    if loaded is None:
+        return None
+    index, matrix, version = loaded
+    return Shard(region, index, matrix, recommender.lexical_for(matrix), version)
+
+
+# Coordinates are routed to the smallest region containing them
+regions = RegionRegistry(REGIONS, load_shard, SHARD_MEMORY_BUDGET)
+# Coordinates inside a loaded region are reverse geocoded from its places' addresses
+client.geocoder.offline = regions
+
+
+def refresh_region(region: Region):
+    """Update/re-snapshot a region if needed, embed it and publish it (requests keep the old shard until then).
+
+    Starts from the published shard (or the JSON snapshot before the first
+    publish) and only publishes if the index or its matrix changed.
+    """
+    shard = regions.get(region, load=False)
+    if shard is not None:
+        index, matrix = shard.index, shard.matrix
+    else:
+        loaded = shared_index.load(shared_root(region), recommender.namespace)
+        index, matrix = loaded[:2] if loaded is not None else (PlaceIndex.load(index_path(region, DATA_DIR)), None)
+    published = matrix
+    path = index_path(region, DATA_DIR)
+    if index is None or index.age_seconds() > PLACE_INDEX_REBUILD_AGE:
+        index = snapshot_region(region, path, client, PLACES_TYPE) or index
+    elif index.sync_age_seconds() > PLACE_INDEX_MAX_AGE:
+        update = update_region(index, path, client, PLACES_TYPE, region)
+        if update is not None:
+            index, changed_ids = update
+            if matrix is not None:
+                # only places whose description changed go through the model
+                matrix = recommender.update_index(index.places, matrix, changed_ids)
+    if index is None:
+        return
+    if matrix is None or matrix.places is not index.places:
+        matrix = recommender.build_index(index.places)
+    if matrix is not published:
+        publish_region(region, index, matrix)
+
+
+def _utcnow() -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+
+
+def refresh_regions():
+    """Refresh every region, one that fails (Overpass down, disk full...) keeps its shard and doesn't stop the rest"""
+    for region in regions.regions:
+        error = None
+        try:
+            refresh_region(region)
+        except Exception as e:
+            print(f"❌ Could not refresh the {region.name} index: {e!r}")
+            error = repr(e)
+        refresh_status[region.name] = {"at": _utcnow(), "error": error}
+
+
+def publish_region(region: Region, index: PlaceIndex, matrix):
+    """Write a region's index + matrix for every worker, then pick it up here too"""
+    try:
+        shared_index.publish(shared_root(region), index, matrix, recommender.namespace)
+    except OSError as e:
+        print(f"❌ Could not publish the {region.name} index: {e}")
+        return
+    follow_shared_index()
+
+
+def follow_shared_index():
+    """Reload loaded shards the leader has published a newer version of (others load it on first use)"""
+    changed = False
+    for region in regions.regions:
+        version = shared_index.current_version(shared_root(region))
+        if version is None or version == shared_versions.get(region.name):
+            continue
+        shared_versions[region.name] = version
+        changed = True
+        shard = regions.get(region, load=False)
+        if shard is not None and shard.version != version:
+            fresh = load_shard(region)
+            if fresh is not None:
+                regions.put(fresh)
+    if changed:
+        result_cache.invalidate()
+        ranked_lists.invalidate()
+
+
+def _startup():
+    global is_leader
+    is_leader = claim_leadership()
+    try:
+        load_recommender()
+    except Exception as e:
+        print(f"❌ Could not load the recommender: {e}")
+        startup_phases["error"] = str(e)
+        return
+    # whatever was published last (by the leader, or a previous run) is usable straight away
+    _timed("index_load", follow_shared_index)
+    if is_leader:
+        _timed("index_refresh", refresh_regions)  # snapshot (if missing/stale) + embedding matrix per region
+    startup_phases["total"] = round(time.perf_counter() - _process_started, 3)
+    print(f"Startup phases (s): {startup_phases}")
+
+
+def _refresh_loop(check_every: float = 600, follow_every: float = 15):
+    global is_leader, loop_error
+    _startup()
+    while model_ready.is_set():
+        time.sleep(check_every if is_leader else follow_every)
+        try:
+            if is_leader:
+                refresh_regions()
+            else:
+                follow_shared_index()
+                # take over if the leader's process went away, with the embedding store only the leader may write
+                if claim_leadership():
+                    recommender.use_store(EMBEDDING_DIR)
+                    is_leader = True
+                    print("Took over as leader, refreshing the regions from now on")
+        except Exception as e:
+            # keep the thread alive, the next round may well work
+            print(f"❌ Background index refresh failed: {e!r}")
+            loop_error = {"at": _utcnow(), "error": repr(e)}
+
+
+@app.get("/healthz")
+def healthz():
+    """Liveness: the process is up and serving"""
+    return {"status": "ok"}
+
+
+@app.get("/readyz")
+def readyz():
+    """Readiness: only route traffic here once the model is loaded and warm"""
+    loaded = {shard.region.name: shard for shard in regions.shards()}
+    body = {
+        "ready": model_ready.is_set(),
+        "role": "leader" if is_leader else "follower",
+        # published: shared index version, None until the leader has built the region;
+        # last_refresh: the leader's last attempt at refreshing it, with its error if it failed
+        "regions": {
+            region.name: {
+                "published": shared_versions.get(region.name),
+                "places": len(loaded[region.name].index) if region.name in loaded else None,
+                "last_refresh": refresh_status.get(region.name),
+            }
+            for region in regions.regions
+        },
+        "loop_error": loop_error,
+        "shard_memory_mb": round(regions.nbytes() / 1e6, 1),
+        "startup_phases": startup_phases,
+    }
+    return JSONResponse(body, status_code=200 if model_ready.is_set() else 503)
+
+
+@app.get("/api/cache/stats")
+def cache_stats():
+    """Hit/miss counters of the response cache, for sizing REC_RESULT_CACHE_SIZE/TTL"""
+    return result_cache.stats()
+
+
+async def region_shard(lat: float, lon: float) -> Optional[Shard]:
+    """Shard of the region at (lat, lon), mapped on first use. None outside every region or before it's published"""
+    region = regions.region_at(lat, lon)
+    if region is None:
+        return None
+    return regions.get(region, load=False) or await run_in_threadpool(regions.get, region)
+
+
+async def fetch_places(lat: float, lon: float, limit: int = 50):
+    """Nearby places from Overpass, for locations no published region covers"""
+    return await client.asearch_nearby((lat, lon), radius=SEARCH_RADIUS, places_type=PLACES_TYPE, limit=limit)
+
+# -----------------------------------------------------------
+#  Metrics (Prometheus text format on /metrics)
+# -----------------------------------------------------------
+REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "rec_request_seconds", "Time to response headers per endpoint", ["path"]))
+_cache_counters = {
+    "rec_result_cache_hits_total": ("Responses served from the result cache", lambda: result_cache.hits),
+    "rec_result_cache_misses_total": ("Result cache lookups that ran the pipeline", lambda: result_cache.misses),
+    "rec_tile_cache_hits_total": ("Fresh geotile cache hits", lambda: client.tile_cache.hits),
+    "rec_tile_cache_stale_hits_total": ("Stale geotile cache hits (refreshed in the background)",
+                                        lambda: client.tile_cache.stale_hits),
+    "rec_tile_cache_misses_total": ("Geotile cache misses (fetched from Overpass)", lambda: client.tile_cache.misses),
+    "rec_geocode_cache_hits_total": ("Addresses geocoded from the local cache", lambda: client.geocoder.cache.hits),
+    "rec_geocode_cache_misses_total": ("Addresses sent to Nominatim", lambda: client.geocoder.cache.misses),
+    "rec_embedding_store_hits_total": ("Place embeddings found in the on-disk store",
+                                       lambda: recommender.embedding_store.hits if recommender and recommender.embedding_store else None),
+    "rec_embedding_store_misses_total": ("Place embeddings that had to be encoded",
+                                         lambda: recommender.embedding_store.misses if recommender and recommender.embedding_store else None),
+    "rec_ranked_list_hits_total": ("Searches paged or re-filtered from a cached ranked list", lambda: ranked_lists.hits),
+    "rec_ranked_list_misses_total": ("Searches that ranked their candidates", lambda: ranked_lists.misses),
+    "rec_region_shard_loads_total": ("Region shards mapped on first use", lambda: regions.loads),
+    "rec_region_shard_evictions_total": ("Idle region shards dropped over the memory budget", lambda: regions.evictions),
+}
+for _name, (_help, _read) in _cache_counters.items():
+    REGISTRY.register(Gauge(_name, _help, _read, kind="counter"))
+REGISTRY.register(Gauge("rec_result_cache_entries", "Responses currently cached", lambda: len(result_cache)))
+REGISTRY.register(Gauge("rec_ranked_list_bytes", "Memory held by cached ranked lists", lambda: ranked_lists.nbytes))
+REGISTRY.register(Gauge("rec_place_index_places", "Places in the loaded region shards",
+                        lambda: sum(len(shard.index) for shard in regions.shards())))
+REGISTRY.register(Gauge("rec_region_shards_loaded", "Region shards currently loaded", lambda: len(regions.shards())))
+REGISTRY.register(Gauge("rec_region_shard_bytes", "Memory counted against REC_SHARD_MEMORY_MB", regions.nbytes))
+_route_paths = None
+
+
+@app.middleware("http")
+async def time_requests(request, call_next):
+    global _route_paths
+    started = time.perf_counter()
+    with collect_timings() as timings:
+        response = await call_next(request)
+    if _route_paths is None:
+        _route_paths = {route.path for route in app.routes}
+    path = request.url.path if request.url.path in _route_paths else "other"  # keeps label cardinality bounded
+    REQUEST_SECONDS.observe(time.perf_counter() - started, path=path)
+    if SERVER_TIMING and timings:
+        response.headers["Server-Timing"] = server_timing(timings)
+    return response
+
+
+@app.get("/metrics")
+def metrics():
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
 
 app.add_middleware(
     CORSMiddleware,
@@ -15,84 +400,345 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-@app.get("/api/recommend")
-def recommend(
-    lat: float,
-    lon: float,
-    query: str = "",
-    price_min: int = 1,
-    price_max: int = 5,
-    rating_min: int = 1,
-    rating_max: int = 6,
-    bookable: bool = False,
-    top_n: int = Query(3, description="Number of recommendations")
-):
-    # Fetch places from Overpass API
-    places = client.search_nearby((lat, lon), radius=3000, places_type=["amenity=restaurant", "amenity=cafe"], limit=50)
-    if not places:
-        return {"results": []}
-    # Get recommendations using semantic search
-    raw_recommendations = recommender.get_recommendations(places, query=query, top_n=top_n*3)  # get more to filter
-    # Clean recommendations for frontend
+def present_recommendations(raw_recommendations: List[Dict]) -> List[Dict]:
+    """Clean ranked places for the frontend and enrich them with the extra fields it shows"""
     recommendations = recommender._clean_recommendations(raw_recommendations)
 
 # -----------------------------------------------------------
 #  Enrich each place with extra fields the frontend can show
 # -----------------------------------------------------------
-    for place in recommendations:
-        tags = place.get("tags", {})  # Overpass tags dict
+    for place, raw in zip(recommendations, raw_recommendations):
+        tags = raw.get("tags", {})  # Overpass tags dict (_clean_recommendations drops it)
 
         # Lat/Lon: insure they’re carried over (in case _clean_recommendations dropped them)
         place["lat"] = place.get("lat") or place.get("latitude")
         place["lon"] = place.get("lon") or place.get("longitude")
 
+        # Metres from the user, when the ranking knew it
+        if raw.get("distance_m") is not None:
+            place["distance_m"] = round(raw["distance_m"])
+        # similarity_score blended with proximity, what the results are ordered by
+        if raw.get("score") is not None:
+            place["score"] = raw["score"]
+
         # Opening hours, website, phone
         place["opening_hours"] = tags.get("opening_hours")
         place["website"]        = tags.get("website")
         place["phone"]          = tags.get("phone") or tags.get("contact:phone")
 
         # Convert “yes” style tags into a compact amenity list
-        amenity_keys = ["wifi", "outdoor_seating", "wheelchair", "reservation", "delivery"]
         place["amenities"] = [
-            key for key in amenity_keys if tags.get(key) == "yes"
+            key for key in AMENITY_FLAGS if tags.get(key) == "yes"
         ]
 
         # Keep raw tags too (optional, but handy for future tweaks)
         place["tags"] = tags
 
-    # --- Post-process filtering based on query params ---
-    filtered = []
-    for place in recommendations:
-        # Filter by price level if available
-        price = place.get('price_level')
-        if price is not None:
-            # Convert price to a number if possible, otherwise skip filter
-            try:
-                price_num = int(price.count('$'))
-                if not (price_min <= price_num <= price_max):
-                    continue
-            except Exception:
-                pass  # If price is not in expected format, skip filter
-
-        # Filter by rating if available
-        rating = place.get('rating')
-        if rating is not None:
-            try:
-                rating_num = float(rating)
-                if not (rating_min <= rating_num <= rating_max):
-                    continue
-            except Exception:
-                pass  # If rating is not a number, skip filter
-
-        # Filter by bookable (e.g., reservation or online booking)
-        if bookable:
-            tags = place.get('tags', {}) 
-            if not (tags.get('reservation') == 'yes' or tags.get('bookable') == 'yes'):
-                continue
-
-        filtered.append(place)
-
-    # Limit to top_n results after filtering
-    filtered = filtered[:top_n]
-
-    return {"results": filtered}
\ No newline at end of file
+    return recommendations
+
+
+@app.get("/api/recommend")
+async def recommend(
+    lat: Optional[float] = None,
+    lon: Optional[float] = None,
+    query: str = "",
+    price_min: int = 1,
+    price_max: int = 5,
+    rating_min: int = 1,
+    rating_max: int = 6,
+    bookable: bool = False,
+    amenities: List[str] = Query([], description=f"Only places with all of these: {', '.join(AMENITY_FLAGS)}"),
+    top_n: int = Query(3, ge=1, le=MAX_TOP_N, description=f"Number of recommendations, at most {MAX_TOP_N}"),
+    max_distance: float = Query(SEARCH_RADIUS, description=f"Travel radius in metres, at most {SEARCH_RADIUS}"),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page; the other parameters are ignored"),
+):
+    if not model_ready.is_set():
+        raise HTTPException(status_code=503, detail="Recommender is still loading")
+    if cursor is not None:
+        # next pages are sliced from the search's ranked list, no need for the response cache
+        lat, lon, query, filters, top_n, radius, offset = _read_cursor(cursor)
+        return await _recommend(lat, lon, query, filters, top_n, radius, offset)
+    if lat is None or lon is None:
+        raise HTTPException(status_code=422, detail="lat and lon are required without a cursor")
+    filters = dict(price_min=price_min, price_max=price_max, rating_min=rating_min,
+                   rating_max=rating_max, bookable=bookable, amenities=amenities)
+
+    # rank the normalised query so a cached answer is exactly what a fresh one would be
+    return await _recommend_cached(lat, lon, normalize_query(query), filters, top_n, travel_radius(max_distance))
+
+
+async def _recommend_cached(lat: float, lon: float, query: str, filters: Dict, top_n: int, radius: float,
+                            query_embedding: np.ndarray = None) -> Dict:
+    """First page of a search (query already normalised), through the response cache"""
+    cache_key = result_cache.make_key(lat, lon, query, top_n=top_n, radius=radius, **filters)
+    cached = result_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    generation = result_cache.generation
+    response = await _recommend(lat, lon, query, filters, top_n, radius, query_embedding=query_embedding)
+    # empty answers are cheap on the index path and may just be a failed Overpass call otherwise
+    if response["results"]:
+        result_cache.put(cache_key, response, generation)
+    return response
+
+
+def travel_radius(max_distance: float) -> float:
+    """Requested travel radius, capped at SEARCH_RADIUS (what Overpass is asked for)"""
+    if max_distance <= 0:
+        raise HTTPException(status_code=422, detail="max_distance must be positive")
+    return min(float(max_distance), SEARCH_RADIUS)
+
+
+def _cursor(lat: float, lon: float, query: str, filters: Dict, top_n: int, radius: float,
+            offset: Optional[int]) -> Optional[str]:
+    """The whole search goes into the cursor, so a page whose ranked list expired can still be served"""
+    if offset is None:
+        return None
+    return encode_cursor({"lat": lat, "lon": lon, "query": query, "filters": filters, "top_n": top_n,
+                          "radius": radius, "offset": offset})
+
+
+def _read_cursor(cursor: str) -> Tuple[float, float, str, Dict, int, float, int]:
+    """The search in a cursor, checked like a batch request body (a tampered one is a 400, not a 500)"""
+    state = decode_cursor(cursor)
+    try:
+        unknown = set(state["filters"]) - {"price_min", "price_max", "rating_min", "rating_max", "bookable", "amenities"}
+        if unknown:
+            raise ValueError(unknown)
+        req = RecommendRequest(lat=state["lat"], lon=state["lon"], query=state["query"], top_n=state["top_n"],
+                               max_distance=state["radius"], **state["filters"])
+        offset = state["offset"]
+        if not isinstance(offset, int) or isinstance(offset, bool) or offset < 0 or req.max_distance <= 0:
+            raise ValueError(offset)
+        return req.lat, req.lon, req.query, req.filters(), req.top_n, travel_radius(req.max_distance), offset
+    except (KeyError, TypeError, ValueError):  # pydantic's ValidationError is a ValueError
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+async def _recommend(lat: float, lon: float, query: str, filters: Dict, top_n: int, radius: float = SEARCH_RADIUS,
+                     offset: int = 0, query_embedding: np.ndarray = None, lists: RankedListCache = None) -> Dict:
+    raw_recommendations, next_offset = [], None
+    async for _, raw_recommendations, next_offset in _recommend_stages(lat, lon, query, filters, top_n, radius,
+                                                                       offset=offset, query_embedding=query_embedding,
+                                                                       lists=lists):
+        pass
+    with stage("enrich"):
+        return {"results": present_recommendations(raw_recommendations),
+                "next_cursor": _cursor(lat, lon, query, filters, top_n, radius, next_offset)}
+
+
+def _nearest(index: PlaceIndex, rows: np.ndarray, distances: np.ndarray, mask: np.ndarray,
+             top_n: int) -> List[Dict]:
+    """The top_n nearest of rows (nearest first, as query_radius returns them) that pass mask"""
+    keep = np.flatnonzero(mask[rows])[:top_n]
+    return [dict(index.places[rows[i]], similarity_score=0.0, distance_m=float(distances[i])) for i in keep]
+
+
+async def _recommend_stages(lat: float, lon: float, query: str, filters: Dict, top_n: int,
+                            radius: float = SEARCH_RADIUS, preview: bool = False, cancel: threading.Event = None,
+                            offset: int = 0, query_embedding: np.ndarray = None, lists: RankedListCache = None
+                            ) -> AsyncIterator[Tuple[str, List[Dict], Optional[int]]]:
+    """Yields (stage, raw recommendations, offset of the next page or None), "ranked" last.
+
+    Every candidate within radius is ranked once per search (location cell, query and
+    radius) and kept in ranked_lists; filters, top_n, offset and the exact location
+    (distances, radius cutoff, proximity blend) only pick a page of it.
+    With preview, a cheap "preview" answer (word matches or nearest places, no model
+    call) comes first when the list has to be ranked. Setting cancel stops encoding
+    places for an abandoned request; query_embedding skips encoding the query; lists
+    replaces ranked_lists (batches keep theirs apart)."""
+    if lists is None:
+        lists = ranked_lists
+    key = lists.make_key(lat, lon, query, radius)
+    ranked = lists.get(key)
+    if ranked is None:
+        generation = lists.generation
+        async for stage_name, result in _rank_candidates(lat, lon, query, filters, top_n, radius, preview, cancel,
+                                                         query_embedding):
+            if stage_name == "preview":
+                yield "preview", result, None
+            else:
+                ranked = result
+        if ranked is None:
+            yield "ranked", [], None
+            return
+        lists.put(key, ranked, generation)
+    with stage("page"):
+        page, next_offset = ranked.page(filters, offset, top_n, lat, lon, radius, recommender.blend_distance)
+    yield "ranked", page, next_offset
+
+
+async def _rank_candidates(lat: float, lon: float, query: str, filters: Dict, top_n: int, radius: float,
+                           preview: bool, cancel: Optional[threading.Event], query_embedding: np.ndarray = None):
+    """Yields ("preview", raw recommendations) if asked for, then ("ranked", RankedList of
+    every candidate, None if there's nothing to rank or the request was cancelled)"""
+    shard = await region_shard(lat, lon)
+    if shard is not None:
+        index, matrix = shard.index, shard.matrix
+        # Places beyond the travel radius (plus how far away other requests sharing the list can
+        # be) are never scored. Filters are a boolean mask over the whole index; the ranking covers
+        # everything in reach (filters only decide whether there's anything to show yet)
+        with stage("filter"):
+            rows, distances = index.query_radius(lat, lon, radius + ranked_lists.reach)
+            mask = np.zeros(len(index), dtype=bool)
+            mask[rows[distances <= radius]] = True
+            mask &= index.filters.mask(**filters)
+        if not mask.any():
+            yield "ranked", None
+            return
+        if preview:
+            yield "preview", (recommender.preview(query, top_n, mask, matrix, shard.lexical)
+                              or _nearest(index, rows, distances, mask, top_n))
+        if query_embedding is None:
+            query_embedding = await recommender.aencode_query(query)
+        # ranking is CPU bound, keep it off the event loop
+        order, scores = await run_in_threadpool(recommender.rank_all, query, rows, matrix=matrix,
+                                                       query_embedding=query_embedding, lexical=shard.lexical)
+        yield "ranked", RankedList(index.places.take(rows[order]), scores)
+    else:
+        # Outside every region (or before it's published): ask Overpass
+        with stage("fetch_places"):
+            places = await fetch_places(lat, lon)
+            places = [place for place in places if place.get("lat") is not None and place.get("lon") is not None]
+        # Cut everything out of reach before it gets encoded
+        with stage("distance"):
+            distances = haversine_m(lat, lon, np.array([place["lat"] for place in places], dtype=np.float64),
+                                    np.array([place["lon"] for place in places], dtype=np.float64))
+            within = np.flatnonzero(distances <= radius + ranked_lists.reach)
+            places, distances = [places[i] for i in within], distances[within]
+        with stage("filter"):
+            keep = FilterColumns(places).mask(**filters) & (distances <= radius) if places else []
+        if not any(keep):
+            yield "ranked", None
+            return
+        if preview:
+            yield "preview", [dict(place, similarity_score=0.0, distance_m=float(distance))
+                              for place, distance, ok in zip(places, distances, keep) if ok][:top_n]
+        if query_embedding is None:
+            query_embedding = await recommender.aencode_query(query)
+        # Get recommendations using semantic search, all of them so filter changes don't re-encode.
+        # Unlike run_in_threadpool, waiting on asyncio.to_thread can be cancelled, so a disconnect
+        # gets to set cancel straight away
+        ranked = await asyncio.to_thread(recommender.get_recommendations, places, query=query, top_n=len(places),
+                                         query_embedding=query_embedding, cancel=cancel)
+        if not ranked:
+            yield "ranked", None
+            return
+        yield "ranked", RankedList(PlaceTable.from_places(ranked),
+                                   np.array([place["similarity_score"] for place in ranked]))
+
+
+def _stream_line(stage_name: str, results: List[Dict], final: bool, next_cursor: str = None) -> str:
+    return json.dumps({"stage": stage_name, "final": final, "results": results, "next_cursor": next_cursor}) + "\n"
+
+
+@app.get("/api/recommend/stream")
+async def recommend_stream(
+    lat: float,
+    lon: float,
+    query: str = "",
+    price_min: int = 1,
+    price_max: int = 5,
+    rating_min: int = 1,
+    rating_max: int = 6,
+    bookable: bool = False,
+    amenities: List[str] = Query([], description=f"Only places with all of these: {', '.join(AMENITY_FLAGS)}"),
+    top_n: int = Query(3, ge=1, le=MAX_TOP_N, description=f"Number of recommendations, at most {MAX_TOP_N}"),
+    max_distance: float = Query(SEARCH_RADIUS, description=f"Travel radius in metres, at most {SEARCH_RADIUS}"),
+):
+    """/api/recommend as NDJSON, one {"stage", "final", "results", "next_cursor"} line per improvement.
+
+    A cached answer is the only line ("cached"). Otherwise a "preview" straight from
+    the index (word matches or the nearest places) comes first and the semantically
+    "ranked" results follow. Work stops once the client disconnects.
+    """
+    if not model_ready.is_set():
+        raise HTTPException(status_code=503, detail="Recommender is still loading")
+    filters = dict(price_min=price_min, price_max=price_max, rating_min=rating_min,
+                   rating_max=rating_max, bookable=bookable, amenities=amenities)
+    radius = travel_radius(max_distance)
+    query = normalize_query(query)
+    cache_key = result_cache.make_key(lat, lon, query, top_n=top_n, radius=radius, **filters)
+    cached = result_cache.get(cache_key)
+    if cached is not None:
+        return StreamingResponse(iter([_stream_line("cached", cached["results"], True, cached.get("next_cursor"))]),
+                                 media_type="application/x-ndjson")
+    generation = result_cache.generation
+
+    async def stream():
+        cancel = threading.Event()
+        try:
+            async for stage_name, raw_recommendations, next_offset in _recommend_stages(
+                    lat, lon, query, filters, top_n, radius, preview=True, cancel=cancel):
+                with stage("enrich"):
+                    results = present_recommendations(raw_recommendations)
+                final = stage_name == "ranked"
+                next_cursor = _cursor(lat, lon, query, filters, top_n, radius, next_offset)
+                if final and results:
+                    result_cache.put(cache_key, {"results": results, "next_cursor": next_cursor}, generation)
+                yield _stream_line(stage_name, results, final, next_cursor)
+        finally:
+            # a disconnect (often: a new keystroke) cancels this generator, stop the encoding it started
+            cancel.set()
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+# -----------------------------------------------------------
+#  Batch recommendations (analytics / pre-warm jobs)
+# -----------------------------------------------------------
+# Requests are grouped by geohash-5 tile (~5 km) and answered tile by tile, so nearby
+# requests share the Overpass fetch (tile cache) and stay on the same region shard
+BATCH_TILE_PRECISION = 5
+
+
+class RecommendRequest(BaseModel):
+    lat: float
+    lon: float
+    query: str = ""
+    price_min: int = 1
+    price_max: int = 5
+    rating_min: int = 1
+    rating_max: int = 6
+    bookable: bool = False
+    amenities: List[str] = []
+    top_n: int = Field(3, ge=1, le=MAX_TOP_N)
+    max_distance: float = SEARCH_RADIUS
+
+    def filters(self) -> Dict:
+        return dict(price_min=self.price_min, price_max=self.price_max, rating_min=self.rating_min,
+                    rating_max=self.rating_max, bookable=self.bookable, amenities=self.amenities)
+
+
+@app.post("/api/recommend/batch")
+async def recommend_batch(requests: List[RecommendRequest]):
+    """Recommendations for many (lat, lon, query, filters) requests in one call.
+
+    Streams one NDJSON line per request, {"index": <position in the body>, "results": [...]},
+    in tile order rather than request order. Each request is ranked like a GET
+    /api/recommend, but without the response cache and with a ranked list cache of
+    its own per tile, so batch traffic never evicts what interactive searches cached.
+    Only the query encodes are done up front in one call.
+    """
+    if not model_ready.is_set():
+        raise HTTPException(status_code=503, detail="Recommender is still loading")
+
+    by_tile: Dict[str, List[Tuple[int, RecommendRequest]]] = {}
+    for i, req in enumerate(requests):
+        by_tile.setdefault(geohash_encode(req.lat, req.lon, BATCH_TILE_PRECISION), []).append((i, req))
+
+    queries = [normalize_query(req.query) for req in requests]
+    radii = [travel_radius(req.max_distance) for req in requests]
+
+    async def stream():
+        # every query string encoded in one batched call
+        query_vectors = await run_in_threadpool(recommender.encode_queries, queries)
+        for batch in by_tile.values():
+            # requests in a tile that share a search rank it once, the lists go with the tile
+            lists = RankedListCache(RANKED_LIST_CACHE_BYTES, RANKED_LIST_TTL, RESULT_CACHE_GRID_M)
+            for i, req in batch:
+                response = await _recommend(req.lat, req.lon, queries[i], req.filters(), req.top_n, radii[i],
+                                            query_embedding=query_vectors[i], lists=lists)
+                yield json.dumps({"index": i, "results": response["results"]}) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
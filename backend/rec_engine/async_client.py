@@ -0,0 +1,124 @@
+import asyncio
+from typing import List, Dict, Optional, Tuple, Union
+
+import httpx
+
+from .recommendation_engine import PlacesAPIClient, raise_for_remark
+from .geotile_cache import GeotileCache
+from .metrics import UPSTREAM_ERRORS, stage
+
+
+class AsyncPlacesAPIClient(PlacesAPIClient):
+    """asyncio version of PlacesAPIClient for use inside async request handlers.
+
+    - one pooled keep-alive httpx connection pool per client
+    - every call has a deadline, retries only spend what's left of it
+    - at most max_concurrency queries are sent to Overpass at once
+    - identical queries already in flight are coalesced into one upstream call
+    - with a tile_cache, stale tiles are refreshed as background tasks
+    """
+
+    def __init__(self, overpass_endpoint: str = 'https://overpass-api.de/api/interpreter', timeout: float = 30.0,
+                 retries: int = 2, max_concurrency: int = 4, max_connections: int = 10,
+                 tile_cache: GeotileCache = None, lean: bool = True):
+        super().__init__(overpass_endpoint, timeout=timeout, retries=retries, tile_cache=tile_cache, lean=lean)
+        self.retries = retries
+        self.max_connections = max_connections
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._background = set()
+        # created lazily so it binds to the running event loop
+        self._http: Optional[httpx.AsyncClient] = None
+
+    def _get_http(self) -> httpx.AsyncClient:
+        if self._http is None or self._http.is_closed:
+            self._http = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections),
+                headers={'Content-Type': 'text/plain', 'Accept-Encoding': 'gzip, deflate'}
+            )
+        return self._http
+
+    async def aclose(self):
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    async def _fetch(self, query: str, timeout: float) -> List[Dict]:
+        """Send one query upstream, retrying overload errors until the deadline runs out (raises on failure)"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        async with self._semaphore:
+            for attempt in range(self.retries + 1):
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                with stage('overpass'):
+                    response = await self._get_http().post(self.overpass_endpoint, content=query, timeout=remaining)
+                if response.status_code in self.RETRY_STATUSES and attempt < self.retries:
+                    await asyncio.sleep(min(0.5 * 2 ** attempt, max(deadline - loop.time(), 0)))
+                    continue
+                response.raise_for_status()
+                return self._parse_response(raise_for_remark(response.json()))
+        raise asyncio.TimeoutError('deadline exceeded')
+
+    async def _shared_fetch(self, query: str, timeout: float = None) -> List[Dict]:
+        """Fetch query, sharing the upstream call with any identical query already in flight"""
+        timeout = timeout or self.timeout
+        task = self._inflight.get(query)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch(query, timeout))
+            self._inflight[query] = task
+            task.add_done_callback(lambda _: self._inflight.pop(query, None))
+        # shield so one caller giving up doesn't cancel the fetch for everyone else
+        return await asyncio.wait_for(asyncio.shield(task), timeout)
+
+    async def _run_query_async(self, query: str, timeout: float = None) -> List[Dict]:
+        """Async _run_query, returns processed places or [] on error"""
+        try:
+            return await self._shared_fetch(query, timeout)
+        except asyncio.TimeoutError:
+            print('Error with Overpass API: deadline exceeded')
+            UPSTREAM_ERRORS.inc(upstream='overpass')
+            return []
+        except Exception as e:
+            self._report_error(e)
+            return []
+
+    async def _refresh_tiles_async(self, tiles: List[str], places_type: List[str]):
+        keys = [self._tile_key(tile, places_type) for tile in tiles]
+        try:
+            fetched = await self._shared_fetch(self._tiles_query(tiles, places_type))
+            self._store_tiles(tiles, fetched, places_type)
+        except Exception as e:
+            self._report_error(e)
+            self.tile_cache.release_refresh(keys)
+
+    async def _search_tiles_async(self, lat: float, lon: float, radius: int, places_type: List[str],
+                                  limit: int, timeout: float = None) -> List[Dict]:
+        cached, missing, stale = self._lookup_tiles(lat, lon, radius, places_type)
+        if missing:
+            try:
+                fetched = await self._shared_fetch(self._tiles_query(missing, places_type), timeout)
+                cached.extend(self._store_tiles(missing, fetched, places_type))
+            except Exception as e:
+                self._report_error(e)
+        claimed = self._claim_stale(stale, places_type)
+        if claimed:
+            # keep a reference so the refresh isn't garbage collected mid-flight
+            task = asyncio.ensure_future(self._refresh_tiles_async(claimed, places_type))
+            self._background.add(task)
+            task.add_done_callback(self._background.discard)
+        return self._merge_tiles(lat, lon, radius, cached, limit)
+
+    async def asearch_nearby(self, location: Union[str, Tuple[float, float]], radius: int = 1000,
+                             places_type: List[str] = None, limit: int = 50, timeout: float = None) -> List[Dict]:
+        """Async search_nearby, geocoding (rate limited, blocking) runs in a worker thread"""
+        if isinstance(location, str):
+            lat, lon = await asyncio.to_thread(self._resolve_location, location)
+        else:
+            lat, lon = self._resolve_location(location)
+        if self.tile_cache is not None and places_type:
+            return await self._search_tiles_async(lat, lon, radius, places_type, limit, timeout)
+        query = self._build_overpass_query(lat, lon, radius, places_type or [], limit)
+        return (await self._run_query_async(query, timeout))[:limit]
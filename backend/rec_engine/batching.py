@@ -0,0 +1,94 @@
+import queue
+import asyncio
+import threading
+import time
+from concurrent.futures import Future
+from typing import List, Tuple
+
+import numpy as np
+
+
+class BatchingEncoder:
+    """Micro-batches query encodes from concurrent callers.
+
+    Texts submitted within max_wait_ms of the first one in a batch (up to
+    max_batch_size) are encoded together in one model.encode call on a dedicated
+    worker thread; each caller gets its own row back through a Future.
+    """
+
+    def __init__(self, model, max_batch_size: int = 32, max_wait_ms: float = 5.0):
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue: 'queue.Queue[Tuple[str, Future]]' = queue.Queue()
+        self._worker = None
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _ensure_worker(self):
+        if self._worker is None:
+            with self._lock:
+                if self._worker is None:
+                    self._worker = threading.Thread(target=self._run, name='query-encoder', daemon=True)
+                    self._worker.start()
+
+    def submit(self, text: str) -> Future:
+        """Queue text for encoding, the Future resolves to its embedding (np.ndarray)"""
+        if self._closed:
+            raise RuntimeError('BatchingEncoder is closed')
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((text, future))
+        return future
+
+    def encode(self, text: str, timeout: float = None) -> np.ndarray:
+        return self.submit(text).result(timeout)
+
+    async def aencode(self, text: str) -> np.ndarray:
+        return await asyncio.wrap_future(self.submit(text))
+
+    def close(self):
+        self._closed = True
+        if self._worker is not None:
+            self._queue.put((None, None))
+
+    def _collect(self) -> List[Tuple[str, Future]]:
+        """Block for the first request, then take whatever else arrives inside the window"""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            stop = any(future is None for _, future in batch)
+            batch = [(text, future) for text, future in batch if future is not None]
+            if batch:
+                self._encode_batch(batch)
+            if stop:
+                return
+
+    def _encode_batch(self, batch: List[Tuple[str, Future]]):
+        # callers that gave up while queued (a cancelled aencode) aren't encoded
+        batch = [(text, future) for text, future in batch if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        # identical texts in the same window are only encoded once
+        unique = list(dict.fromkeys(text for text, _ in batch))
+        try:
+            vectors = self.model.encode(unique, convert_to_numpy=True, batch_size=len(unique))
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        row_of = {text: i for i, text in enumerate(unique)}
+        for text, future in batch:
+            future.set_result(vectors[row_of[text]])
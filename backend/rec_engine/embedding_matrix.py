@@ -0,0 +1,104 @@
+from typing import List, Dict, Sequence, Tuple
+
+import numpy as np
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def top_k(scores: np.ndarray, k: int, rows: np.ndarray = None) -> Tuple[np.ndarray, np.ndarray]:
+    """Indices of the k highest scores (best first) without a full sort.
+
+    If rows is given, scores[i] belongs to rows[i] and rows are what's returned.
+    """
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+    if k < len(scores):
+        best = np.argpartition(-scores, k - 1)[:k]
+    else:
+        best = np.arange(len(scores))
+    best = best[np.argsort(-scores[best], kind='stable')]
+    return (best if rows is None else rows[best]), scores[best]
+
+
+def place_ids(places) -> List[str]:
+    """Ids of a list of place dicts or a PlaceTable (without materialising its rows)"""
+    ids = getattr(places, 'ids', None)
+    if ids is not None:
+        return ids
+    return [place.get('id') for place in places]
+
+
+class EmbeddingMatrix:
+    """Pre-normalised embeddings for a fixed list of places, one row per place.
+
+    float32 is the fastest to score. float16 and int8 halve/quarter the memory
+    but are upcast (in chunks) when scoring, so they trade speed for footprint.
+    """
+
+    DTYPES = ('float32', 'float16', 'int8')
+
+    def __init__(self, vectors: np.ndarray, places: Sequence[Dict], dtype: str = 'float32', chunk_rows: int = 8192):
+        if dtype not in self.DTYPES:
+            raise ValueError(f'dtype must be one of {self.DTYPES}')
+        if len(vectors) != len(places):
+            raise ValueError('Need exactly one embedding per place')
+        self.places = places
+        self.dtype = dtype
+        self.chunk_rows = chunk_rows
+        self.row_of = {place_id: i for i, place_id in enumerate(place_ids(places))}
+
+        vectors = normalize_rows(vectors)
+        if dtype == 'int8':
+            # unit vectors are within [-1, 1] so a fixed scale keeps it simple
+            self.scale = 1.0 / 127
+            self.vectors = np.ascontiguousarray(np.round(vectors * 127), dtype=np.int8)
+        else:
+            self.scale = 1.0
+            self.vectors = np.ascontiguousarray(vectors, dtype=dtype)
+
+    @classmethod
+    def from_stored(cls, vectors: np.ndarray, places: Sequence[Dict], scale: float = 1.0,
+                    chunk_rows: int = 8192) -> 'EmbeddingMatrix':
+        """Wrap rows that are already normalised (and quantised), e.g. a read-only memmap, without copying"""
+        if len(vectors) != len(places):
+            raise ValueError('Need exactly one embedding per place')
+        matrix = cls.__new__(cls)
+        matrix.places = places
+        matrix.dtype = str(vectors.dtype)
+        matrix.chunk_rows = chunk_rows
+        matrix.row_of = {place_id: i for i, place_id in enumerate(place_ids(places))}
+        matrix.scale = scale
+        matrix.vectors = vectors
+        return matrix
+
+    def __len__(self):
+        return len(self.places)
+
+    @property
+    def nbytes(self):
+        return self.vectors.nbytes
+
+    def _matvec(self, vectors: np.ndarray, query: np.ndarray) -> np.ndarray:
+        if self.dtype == 'float32':
+            return vectors @ query
+        out = np.empty(len(vectors), dtype=np.float32)
+        for start in range(0, len(vectors), self.chunk_rows):
+            chunk = vectors[start:start + self.chunk_rows].astype(np.float32)
+            out[start:start + self.chunk_rows] = chunk @ query
+        return out * self.scale
+
+    def scores(self, query_embedding: np.ndarray, rows: np.ndarray = None) -> np.ndarray:
+        """Cosine similarity of the query against every row (or just the given rows)"""
+        query = normalize_rows(np.asarray(query_embedding).reshape(-1))
+        if rows is None:
+            return self._matvec(self.vectors, query)
+        return self._matvec(self.vectors[rows], query)
+
+    def dense(self, rows: np.ndarray) -> np.ndarray:
+        """float32 copy of the given rows, whatever the storage dtype"""
+        return self.vectors[rows].astype(np.float32) * np.float32(self.scale)
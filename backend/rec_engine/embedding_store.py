@@ -0,0 +1,155 @@
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import List, Optional
+
+import numpy as np
+
+
+def make_key(place_id: Optional[str], description: str) -> str:
+    """Key an embedding by place id plus a hash of the text that was encoded"""
+    digest = hashlib.sha1(description.encode('utf-8')).hexdigest()[:16]
+    return f"{place_id or 'anon'}:{digest}"
+
+
+class EmbeddingStore:
+    """Persistent cache of place embeddings.
+
+    Recently used vectors sit in an in-memory LRU. Every vector is also written
+    to a memory-mapped float32 matrix on disk (one row per key, keys listed in
+    keys.txt in row order), so a restarted process can reuse all of them.
+    """
+
+    MATRIX_FILE = 'embeddings.f32'
+    KEYS_FILE = 'keys.txt'
+
+    def __init__(self, path: str, dim: int, capacity: int = 20000, grow_rows: int = 4096):
+        self.path = path
+        self.dim = dim
+        self.capacity = capacity
+        self.grow_rows = grow_rows
+        self._lock = threading.Lock()
+        self._lru: 'OrderedDict[str, np.ndarray]' = OrderedDict()
+        self._rows: dict = {}
+        # row the next new key goes to (= complete lines in keys.txt)
+        self._next_row = 0
+        self._matrix: Optional[np.memmap] = None
+        self._allocated = 0
+        # lookups served from memory or disk vs. not stored at all, exported on /metrics
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(path, exist_ok=True)
+        self._load()
+
+    @property
+    def _matrix_path(self):
+        return os.path.join(self.path, self.MATRIX_FILE)
+
+    @property
+    def _keys_path(self):
+        return os.path.join(self.path, self.KEYS_FILE)
+
+    def _load(self):
+        """Re-open the on-disk matrix and rebuild the key -> row map"""
+        if os.path.exists(self._keys_path):
+            with open(self._keys_path, 'rb') as f:
+                data = f.read()
+            complete = data.rfind(b'\n') + 1
+            if complete < len(data):
+                # a crash mid-append left half a key: drop it, or the next key would be glued onto it
+                with open(self._keys_path, 'r+b') as f:
+                    f.truncate(complete)
+            lines = data[:complete].decode('utf-8').split('\n')[:-1]
+            for row, key in enumerate(lines):
+                if key:
+                    self._rows[key] = row
+            # line n is row n, blank or repeated lines still took a row
+            self._next_row = len(lines)
+        if os.path.exists(self._matrix_path):
+            allocated = os.path.getsize(self._matrix_path) // (self.dim * 4)
+            # Keys are appended only after their row is flushed, so any key past
+            # the end of the matrix means the files don't belong together
+            if allocated < self._next_row:
+                print(f'❌ Embedding store at {self.path} is inconsistent, starting empty')
+                self._rows = {}
+                self._next_row = 0
+                open(self._keys_path, 'w').close()
+                allocated = 0
+            if allocated:
+                self._allocated = allocated
+                self._matrix = np.memmap(self._matrix_path, dtype=np.float32, mode='r+', shape=(allocated, self.dim))
+        elif self._next_row:
+            print(f'❌ Embedding store at {self.path} has keys but no matrix, starting empty')
+            self._rows = {}
+            self._next_row = 0
+            open(self._keys_path, 'w').close()
+
+    def _ensure_rows(self, needed: int):
+        """Grow the backing file so it can hold at least `needed` rows"""
+        if needed <= self._allocated:
+            return
+        new_allocated = max(needed, self._allocated + self.grow_rows)
+        if self._matrix is not None:
+            self._matrix.flush()
+            del self._matrix
+        with open(self._matrix_path, 'ab') as f:
+            f.truncate(new_allocated * self.dim * 4)
+        self._allocated = new_allocated
+        self._matrix = np.memmap(self._matrix_path, dtype=np.float32, mode='r+', shape=(new_allocated, self.dim))
+
+    def _remember(self, key: str, vector: np.ndarray):
+        self._lru[key] = vector
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.capacity:
+            self._lru.popitem(last=False)
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __contains__(self, key: str):
+        return key in self._rows
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        """Return the vector for key, or None if it has never been stored"""
+        with self._lock:
+            vector = self._lru.get(key)
+            if vector is not None:
+                self._lru.move_to_end(key)
+                self.hits += 1
+                return vector
+            row = self._rows.get(key)
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            vector = np.array(self._matrix[row])
+            self._remember(key, vector)
+            return vector
+
+    def get_many(self, keys: List[str]) -> List[Optional[np.ndarray]]:
+        return [self.get(key) for key in keys]
+
+    def put_many(self, keys: List[str], vectors: np.ndarray):
+        """Store vectors (one row per key), skipping keys already on disk"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        with self._lock:
+            new = [(key, vec) for key, vec in zip(keys, vectors) if key not in self._rows]
+            # de-duplicate within the batch too
+            new = list(OrderedDict(new).items())
+            if new:
+                start = self._next_row
+                self._ensure_rows(start + len(new))
+                for offset, (_, vec) in enumerate(new):
+                    self._matrix[start + offset] = vec
+                self._matrix.flush()
+                with open(self._keys_path, 'a', encoding='utf-8') as f:
+                    for offset, (key, _) in enumerate(new):
+                        f.write(key + '\n')
+                        self._rows[key] = start + offset
+                self._next_row = start + len(new)
+            for key, vec in zip(keys, vectors):
+                self._remember(key, vec)
+
+    def put(self, key: str, vector: np.ndarray):
+        self.put_many([key], np.asarray(vector).reshape(1, -1))
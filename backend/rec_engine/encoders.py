@@ -0,0 +1,60 @@
+from typing import List, TYPE_CHECKING
+
+import numpy as np
+
+if TYPE_CHECKING:
+    # imported lazily in load_encoder, pulling in torch takes seconds
+    from sentence_transformers import SentenceTransformer
+
+DEFAULT_MODEL = 'all-mpnet-base-v2'
+# ~5x smaller and several times faster on CPU, at some cost in ranking quality
+DISTILLED_MODEL = 'all-MiniLM-L6-v2'
+
+# torch:  plain fp32 PyTorch (the original setup)
+# int8:   PyTorch with every nn.Linear dynamically quantised to int8
+# onnx:   ONNX Runtime graph (sentence-transformers >= 3.2 and optimum[onnxruntime])
+BACKENDS = ('torch', 'int8', 'onnx')
+
+
+def load_encoder(model_name: str = DEFAULT_MODEL, backend: str = 'torch') -> 'SentenceTransformer':
+    """Load model_name for CPU inference with the given backend.
+
+    Every backend returns a SentenceTransformer, so callers keep using .encode().
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f'backend must be one of {BACKENDS}')
+    from sentence_transformers import SentenceTransformer
+
+    if backend == 'onnx':
+        # exports the graph on first load if the hub repo doesn't ship one
+        return SentenceTransformer(model_name, device='cpu', backend='onnx')
+
+    model = SentenceTransformer(model_name, device='cpu')
+    if backend == 'int8':
+        import torch
+        torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+    return model
+
+
+def store_namespace(model_name: str, backend: str) -> str:
+    """Directory name for cached embeddings, backends don't produce identical vectors"""
+    name = model_name.replace('/', '_')
+    return name if backend == 'torch' else f'{name}-{backend}'
+
+
+def recall_at_k(reference: np.ndarray, candidate: np.ndarray, k: int) -> float:
+    """Mean overlap of the top-k rows per query between two (queries x places) score matrices"""
+    k = min(k, reference.shape[1])
+    hits = []
+    for ref_row, cand_row in zip(reference, candidate):
+        ref_top = set(np.argpartition(-ref_row, k - 1)[:k])
+        cand_top = set(np.argpartition(-cand_row, k - 1)[:k])
+        hits.append(len(ref_top & cand_top) / k)
+    return float(np.mean(hits)) if hits else 0.0
+
+
+def score_matrix(model: 'SentenceTransformer', queries: List[str], descriptions: List[str]) -> np.ndarray:
+    """Cosine similarity of every query against every description"""
+    query_vectors = model.encode(queries, convert_to_numpy=True, normalize_embeddings=True)
+    place_vectors = model.encode(descriptions, convert_to_numpy=True, normalize_embeddings=True)
+    return query_vectors @ place_vectors.T
@@ -0,0 +1,75 @@
+from typing import List, Dict, Iterable
+
+import numpy as np
+
+# "yes"-style OSM tags surfaced to the frontend as an amenity list, one bit each
+AMENITY_FLAGS = ["wifi", "outdoor_seating", "wheelchair", "reservation", "delivery"]
+# price levels run 1..MAX_PRICE_LEVEL (the price_min/price_max range of /api/recommend)
+MAX_PRICE_LEVEL = 5
+
+
+def price_level_of(place: Dict) -> int:
+    """'$$' style (or plain number) price level, -1 if unknown or outside 1..MAX_PRICE_LEVEL
+    (so it always fits the int8 columns)"""
+    price = place.get('price_level') or place.get('tags', {}).get('price_level')
+    if price is None:
+        return -1
+    price = str(price).strip()
+    level = int(price) if price.isdigit() else price.count('$')
+    return level if 1 <= level <= MAX_PRICE_LEVEL else -1
+
+
+def rating_of(place: Dict) -> float:
+    rating = place.get('rating') or place.get('tags', {}).get('rating')
+    try:
+        return float(rating)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+class FilterColumns:
+    """Compact filter columns for a list of places, one row per place.
+
+    Unknown price levels (-1) and ratings (NaN) pass the price/rating filters,
+    same as the old per-place checks in main.recommend.
+    """
+
+    def __init__(self, places: List[Dict]):
+        tags = [place.get('tags') or {} for place in places]
+        self.price_level = np.array([price_level_of(p) for p in places], dtype=np.int8)
+        self.rating = np.array([rating_of(p) for p in places], dtype=np.float32)
+        self.bookable = np.array(
+            [t.get('reservation') == 'yes' or t.get('bookable') == 'yes' for t in tags], dtype=bool
+        )
+        self.amenities = np.array(
+            [sum(1 << bit for bit, key in enumerate(AMENITY_FLAGS) if t.get(key) == 'yes') for t in tags],
+            dtype=np.uint8
+        )
+
+    @classmethod
+    def from_table(cls, table) -> 'FilterColumns':
+        """Columns straight from a PlaceTable's arrays, no per-place work"""
+        columns = cls.__new__(cls)
+        columns.price_level = table.price_level
+        columns.rating = table.rating
+        columns.bookable = table.has_flag('reservation') | table.has_flag('bookable')
+        columns.amenities = np.zeros(len(table), dtype=np.uint8)
+        for bit, key in enumerate(AMENITY_FLAGS):
+            columns.amenities |= table.has_flag(key).astype(np.uint8) << bit
+        return columns
+
+    def __len__(self):
+        return len(self.price_level)
+
+    def mask(self, price_min: int = 1, price_max: int = 5, rating_min: float = 1, rating_max: float = 6,
+             bookable: bool = False, amenities: Iterable[str] = ()) -> np.ndarray:
+        """Boolean mask of the rows that pass every filter"""
+        price_ok = (self.price_level < 0) | ((self.price_level >= price_min) & (self.price_level <= price_max))
+        rating_ok = np.isnan(self.rating) | ((self.rating >= rating_min) & (self.rating <= rating_max))
+        mask = price_ok & rating_ok
+        if bookable:
+            mask &= self.bookable
+        wanted = sum(1 << AMENITY_FLAGS.index(key) for key in set(amenities) if key in AMENITY_FLAGS)
+        if wanted:
+            mask &= (self.amenities & wanted) == wanted
+        return mask
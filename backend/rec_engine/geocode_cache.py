@@ -0,0 +1,171 @@
+import os
+import re
+import json
+import time
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from .place_index import PlaceIndex
+
+_NON_WORD = re.compile(r'[^a-z0-9#]+')
+# "Blk 1 Jln Bt Merah" and "Block 1 Jalan Bukit Merah" are one cache entry
+ABBREVIATIONS = {
+    'rd': 'road', 'st': 'street', 'ave': 'avenue', 'av': 'avenue', 'dr': 'drive', 'cres': 'crescent',
+    'ctrl': 'central', 'ctr': 'centre', 'blk': 'block', 'jln': 'jalan', 'bt': 'bukit', 'lor': 'lorong',
+    'upp': 'upper', 'nth': 'north', 'sth': 'south', 'pl': 'place', 'tce': 'terrace', 'sg': 'singapore',
+}
+
+
+def normalize_address(query: str) -> str:
+    """Cache key of an address: lowercase words, punctuation dropped, common abbreviations expanded"""
+    words = _NON_WORD.sub(' ', (query or '').lower()).split()
+    return ' '.join(ABBREVIATIONS.get(word, word) for word in words)
+
+
+class GeocodeCache:
+    """Persistent forward-geocode cache keyed by normalize_address(query).
+
+    Entries live in memory (LRU, max_entries) and are appended to a JSON-lines
+    file, so restarts and other workers sharing the file start warm. Addresses
+    Nominatim didn't find are cached too, for the shorter negative_ttl.
+    """
+
+    def __init__(self, path: str, ttl: float = 30 * 24 * 3600, negative_ttl: float = 24 * 3600,
+                 max_entries: int = 50000):
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # key -> (stored at, result or None)
+        self._entries: 'OrderedDict[str, Tuple[float, Optional[Dict]]]' = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._load()
+
+    def _expired(self, stored_at: float, result: Optional[Dict], now: float) -> bool:
+        return now - stored_at > (self.ttl if result is not None else self.negative_ttl)
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        lines = 0
+        now = time.time()
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    lines += 1
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # half-written last line
+                    if not self._expired(entry['at'], entry['result'], now):
+                        self._entries[entry['key']] = (entry['at'], entry['result'])
+                        self._entries.move_to_end(entry['key'])
+        except OSError as e:
+            print(f'❌ Could not load geocode cache {self.path}: {e}')
+            return
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        if lines > 2 * len(self._entries) + 100:
+            self._compact()
+
+    def _compact(self):
+        """Rewrite the file with just the live entries (atomically)"""
+        tmp_path = f'{self.path}.{os.getpid()}.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                for key, (stored_at, result) in self._entries.items():
+                    f.write(json.dumps({'key': key, 'at': stored_at, 'result': result}) + '\n')
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f'❌ Could not compact geocode cache {self.path}: {e}')
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, query: str) -> Tuple[bool, Optional[Dict]]:
+        """(found, result); found with result None means Nominatim had no match"""
+        key = normalize_address(query)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or self._expired(entry[0], entry[1], time.time()):
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, entry[1]
+
+    def put(self, query: str, result: Optional[Dict]):
+        key = normalize_address(query)
+        stored_at = time.time()
+        line = json.dumps({'key': key, 'at': stored_at, 'result': result}) + '\n'
+        with self._lock:
+            self._entries[key] = (stored_at, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                # one short O_APPEND write per entry, so workers sharing the file don't interleave lines
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.write(line)
+            except OSError as e:
+                print(f'❌ Could not write geocode cache {self.path}: {e}')
+
+
+class OfflineReverseGeocoder:
+    """Reverse geocoding from the addresses of the places in a PlaceIndex.
+
+    The nearest place with an addr:street or addr:postcode within max_distance_m
+    (found through the index's grid) names the location, Nominatim-style.
+    Points outside the index's area or with no address nearby return None.
+    """
+
+    def __init__(self, index: PlaceIndex, country: str, country_code: str, max_distance_m: float = 150):
+        self.index = index
+        self.max_distance_m = max_distance_m
+        self.country = country
+        self.country_code = country_code
+        codes = index.places.codes
+        self.has_address = (codes['addr:street'] >= 0) | (codes['addr:postcode'] >= 0)
+        self.hits = 0
+
+    def reverse(self, lat: float, lon: float) -> Optional[Dict]:
+        if not self.index.covers(lat, lon):
+            return None
+        rows, _ = self.index.query_radius(lat, lon, self.max_distance_m)
+        rows = rows[self.has_address[rows]]
+        if not len(rows):
+            return None
+        tags = self.index.places.tags(int(rows[0]))
+        address = {
+            'amenity': tags.get('name'),
+            'house_number': tags.get('addr:housenumber'),
+            'road': tags.get('addr:street'),
+            'city': tags.get('addr:city'),
+            'postcode': tags.get('addr:postcode'),
+            'country': self.country,
+            'country_code': self.country_code,
+        }
+        address = {key: value for key, value in address.items() if value}
+        street = ' '.join(part for part in (address.get('house_number'), address.get('road')) if part)
+        city = ' '.join(part for part in (address.get('city'), address.get('postcode')) if part)
+        self.hits += 1
+        return {
+            'display_name': ', '.join(part for part in (address.get('amenity'), street, city) if part),
+            'address': address,
+        }
+
+
+def offline_geocoder(index: Optional[PlaceIndex], country: str = None,
+                     country_code: str = None) -> Optional[OfflineReverseGeocoder]:
+    """OfflineReverseGeocoder over index, None if there's no index, none of it has addresses or
+    its country isn't known (Nominatim answers there instead of a guess)"""
+    if index is None or not len(index) or not country or not country_code:
+        return None
+    geocoder = OfflineReverseGeocoder(index, country, country_code)
+    return geocoder if np.any(geocoder.has_address) else None
@@ -0,0 +1,158 @@
+import math
+import time
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Optional, Tuple
+
+_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+METERS_PER_DEG_LAT = 111320.0
+
+
+def geohash_encode(lat: float, lon: float, precision: int = 6) -> str:
+    """Standard geohash of a point"""
+    lat_lo, lat_hi, lon_lo, lon_hi = -90.0, 90.0, -180.0, 180.0
+    chars, bits, bit_count, even = [], 0, 0, True
+    while len(chars) < precision:
+        if even:
+            mid = (lon_lo + lon_hi) / 2
+            if lon >= mid:
+                bits, lon_lo = (bits << 1) | 1, mid
+            else:
+                bits, lon_hi = bits << 1, mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if lat >= mid:
+                bits, lat_lo = (bits << 1) | 1, mid
+            else:
+                bits, lat_hi = bits << 1, mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_BASE32[bits])
+            bits, bit_count = 0, 0
+    return ''.join(chars)
+
+
+def geohash_bbox(tile: str) -> Tuple[float, float, float, float]:
+    """(min_lat, min_lon, max_lat, max_lon) of a geohash cell"""
+    lat_lo, lat_hi, lon_lo, lon_hi = -90.0, 90.0, -180.0, 180.0
+    even = True
+    for char in tile:
+        value = _BASE32.index(char)
+        for shift in range(4, -1, -1):
+            bit = (value >> shift) & 1
+            if even:
+                mid = (lon_lo + lon_hi) / 2
+                lon_lo, lon_hi = (mid, lon_hi) if bit else (lon_lo, mid)
+            else:
+                mid = (lat_lo + lat_hi) / 2
+                lat_lo, lat_hi = (mid, lat_hi) if bit else (lat_lo, mid)
+            even = not even
+    return lat_lo, lon_lo, lat_hi, lon_hi
+
+
+def tile_size(precision: int) -> Tuple[float, float]:
+    """(lat degrees, lon degrees) covered by one geohash cell at this precision"""
+    bits = precision * 5
+    lon_bits = (bits + 1) // 2
+    lat_bits = bits // 2
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lon_bits)
+
+
+def covering_tiles(lat: float, lon: float, radius: float, precision: int = 6) -> List[str]:
+    """Geohash cells that together cover the circle of radius metres around (lat, lon)"""
+    dlat = radius / METERS_PER_DEG_LAT
+    dlon = radius / (METERS_PER_DEG_LAT * max(math.cos(math.radians(lat)), 1e-6))
+    step_lat, step_lon = tile_size(precision)
+
+    # walk cell centres so every cell overlapping the bbox is hit exactly once
+    lat_start = math.floor((lat - dlat + 90) / step_lat) * step_lat - 90 + step_lat / 2
+    lon_start = math.floor((lon - dlon + 180) / step_lon) * step_lon - 180 + step_lon / 2
+    tiles = []
+    cell_lat = lat_start
+    while cell_lat - step_lat / 2 <= lat + dlat:
+        cell_lon = lon_start
+        while cell_lon - step_lon / 2 <= lon + dlon:
+            tiles.append(geohash_encode(cell_lat, cell_lon, precision))
+            cell_lon += step_lon
+        cell_lat += step_lat
+    return tiles
+
+
+def merge_bbox(tiles: List[str]) -> Tuple[float, float, float, float]:
+    boxes = [geohash_bbox(tile) for tile in tiles]
+    return (min(b[0] for b in boxes), min(b[1] for b in boxes),
+            max(b[2] for b in boxes), max(b[3] for b in boxes))
+
+
+class GeotileCache:
+    """Memory-bounded cache of Overpass results per geohash tile.
+
+    Entries younger than ttl are fresh. Between ttl and stale_ttl they are still
+    served but should be refreshed in the background; older than that they are
+    treated as a miss. Least recently used tiles are evicted past max_tiles.
+    """
+
+    FRESH, STALE = 'fresh', 'stale'
+
+    def __init__(self, precision: int = 6, ttl: float = 6 * 3600, stale_ttl: float = 7 * 24 * 3600,
+                 max_tiles: int = 5000):
+        self.precision = precision
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_tiles = max_tiles
+        self._lock = threading.Lock()
+        self._tiles: 'OrderedDict[str, Tuple[float, List[Dict]]]' = OrderedDict()
+        self._refreshing = set()
+        # lookups by outcome, exported on /metrics
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._tiles)
+
+    def get(self, key: str) -> Tuple[Optional[List[Dict]], Optional[str]]:
+        """(places, FRESH/STALE) for a tile key, or (None, None) on a miss"""
+        with self._lock:
+            entry = self._tiles.get(key)
+            if entry is None:
+                self.misses += 1
+                return None, None
+            fetched_at, places = entry
+            age = time.time() - fetched_at
+            if age > self.stale_ttl:
+                del self._tiles[key]
+                self.misses += 1
+                return None, None
+            self._tiles.move_to_end(key)
+            if age <= self.ttl:
+                self.hits += 1
+                return places, self.FRESH
+            self.stale_hits += 1
+            return places, self.STALE
+
+    def put(self, key: str, places: List[Dict]):
+        with self._lock:
+            self._tiles[key] = (time.time(), places)
+            self._tiles.move_to_end(key)
+            self._refreshing.discard(key)
+            while len(self._tiles) > self.max_tiles:
+                self._tiles.popitem(last=False)
+
+    def claim_refresh(self, keys: List[str]) -> List[str]:
+        """Mark stale keys as being refreshed, returns the ones nobody else is refreshing yet"""
+        with self._lock:
+            claimed = [key for key in keys if key not in self._refreshing]
+            self._refreshing.update(claimed)
+            return claimed
+
+    def release_refresh(self, keys: List[str]):
+        """Give up on refreshing keys (e.g. the fetch failed) so a later request can retry"""
+        with self._lock:
+            self._refreshing.difference_update(keys)
+
+    def clear(self):
+        with self._lock:
+            self._tiles.clear()
+            self._refreshing.clear()
@@ -0,0 +1,171 @@
+"""Run the sentence-transformers model in one process that all uvicorn workers share.
+
+Workers connect with RemoteEncoder (set REC_ENCODER_ADDRESS) and never load
+torch or the weights themselves. Single-text encodes from every worker go
+through one BatchingEncoder, so concurrent queries still share model calls.
+
+Run from backend/:  python -m rec_engine.inference_server [--address data/encoder.sock]
+(use host:port instead of a socket path on Windows, that needs REC_ENCODER_AUTHKEY)
+"""
+import os
+import time
+import secrets
+import argparse
+import threading
+from multiprocessing.connection import Client, Listener
+from typing import List, Union
+
+import numpy as np
+
+from .encoders import BACKENDS, DEFAULT_MODEL, load_encoder
+from .batching import BatchingEncoder
+from .embedding_matrix import normalize_rows
+
+DATA_DIR = os.getenv('REC_DATA_DIR', os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data'))
+DEFAULT_ADDRESS = os.path.join(DATA_DIR, 'encoder.sock')
+KEY_PATH = os.path.join(DATA_DIR, 'encoder.key')
+
+
+def _authkey(address=None) -> bytes:
+    """Shared secret for the connection: REC_ENCODER_AUTHKEY, else a random key kept in DATA_DIR/encoder.key
+    (mode 0600, created by whichever of server and workers comes first). TCP needs the explicit key."""
+    key = os.getenv('REC_ENCODER_AUTHKEY', '').encode()
+    if key:
+        return key
+    if isinstance(address, tuple):
+        raise ValueError('REC_ENCODER_AUTHKEY must be set to serve the encoder over TCP')
+    os.makedirs(DATA_DIR, exist_ok=True)
+    if not os.path.exists(KEY_PATH):
+        tmp = f'{KEY_PATH}.{os.getpid()}'
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            f.write(secrets.token_hex(32))
+        try:
+            os.link(tmp, KEY_PATH)  # never replaces a key another process already wrote
+        except FileExistsError:
+            pass
+        finally:
+            os.unlink(tmp)
+    with open(KEY_PATH) as f:
+        return f.read().strip().encode()
+
+
+def parse_address(address: str):
+    """'host:port' -> (host, port) for TCP, anything else is a Unix socket path"""
+    host, _, port = address.rpartition(':')
+    if host and port.isdigit():
+        return host, int(port)
+    return address
+
+
+def _handle(conn, model, batcher: BatchingEncoder, info: dict):
+    with conn:
+        while True:
+            try:
+                op, payload = conn.recv()
+            except (EOFError, OSError):
+                return
+            try:
+                if op == 'info':
+                    result = info
+                elif op == 'encode':
+                    texts, batch_size = payload
+                    if len(texts) == 1:
+                        result = batcher.encode(texts[0])[None, :]
+                    else:
+                        result = model.encode(texts, convert_to_numpy=True, batch_size=batch_size)
+                else:
+                    raise ValueError(f'unknown op {op!r}')
+                conn.send(('ok', result))
+            except Exception as e:
+                conn.send(('error', repr(e)))
+
+
+def serve(address: str = DEFAULT_ADDRESS, model_name: str = DEFAULT_MODEL, backend: str = 'torch',
+          authkey: bytes = None, max_batch_size: int = 32, max_wait_ms: float = 5.0):
+    model = load_encoder(model_name, backend)
+    batcher = BatchingEncoder(model, max_batch_size, max_wait_ms)
+    info = {'model_name': model_name, 'backend': backend, 'dim': model.get_sentence_embedding_dimension()}
+
+    address = parse_address(address)
+    authkey = authkey or _authkey(address)
+    if isinstance(address, str):
+        os.makedirs(os.path.dirname(os.path.abspath(address)), exist_ok=True)
+        if os.path.exists(address):
+            os.unlink(address)  # left over from a previous run
+    with Listener(address, authkey=authkey) as listener:
+        if isinstance(address, str):
+            os.chmod(address, 0o600)
+        print(f'Encoder {model_name} ({backend}) listening on {address}')
+        while True:
+            conn = listener.accept()
+            threading.Thread(target=_handle, args=(conn, model, batcher, info), daemon=True).start()
+
+
+class RemoteEncoder:
+    """Stand-in for a SentenceTransformer whose encode() runs in an inference server process.
+
+    Each thread gets its own connection; a dropped connection is reopened once per call.
+    """
+
+    def __init__(self, address: str = DEFAULT_ADDRESS, authkey: bytes = None, connect_timeout: float = 120):
+        self.address = parse_address(address)
+        self.authkey = authkey or _authkey(self.address)
+        self._local = threading.local()
+        # the server may still be loading the model, keep trying for a while
+        deadline = time.monotonic() + connect_timeout
+        while True:
+            try:
+                info = self._call('info', None)
+                break
+            except (ConnectionError, FileNotFoundError):
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.5)
+        self.model_name = info['model_name']
+        self.backend = info['backend']
+        self.dim = info['dim']
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = Client(self.address, authkey=self.authkey)
+        return conn
+
+    def _call(self, op: str, payload):
+        for attempt in range(2):
+            try:
+                conn = self._connection()
+                conn.send((op, payload))
+                status, result = conn.recv()
+                break
+            except (EOFError, OSError):
+                self._local.conn = None
+                if attempt:
+                    raise
+        if status == 'error':
+            raise RuntimeError(f'Inference server error: {result}')
+        return result
+
+    def encode(self, sentences: Union[str, List[str]], convert_to_numpy: bool = True, batch_size: int = 32,
+               normalize_embeddings: bool = False, **kwargs) -> np.ndarray:
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        vectors = self._call('encode', (texts, batch_size))
+        if normalize_embeddings:
+            vectors = normalize_rows(vectors)
+        return vectors[0] if single else vectors
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dim
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--address', default=os.getenv('REC_ENCODER_ADDRESS', DEFAULT_ADDRESS))
+    parser.add_argument('--model', default=os.getenv('REC_MODEL', DEFAULT_MODEL))
+    parser.add_argument('--backend', default=os.getenv('REC_ENCODER_BACKEND', 'torch'), choices=BACKENDS)
+    parser.add_argument('--max-batch', type=int, default=int(os.getenv('REC_MAX_BATCH', '32')))
+    parser.add_argument('--max-wait-ms', type=float, default=float(os.getenv('REC_BATCH_WAIT_MS', '5')))
+    args = parser.parse_args()
+    serve(args.address, args.model, args.backend, max_batch_size=args.max_batch, max_wait_ms=args.max_wait_ms)
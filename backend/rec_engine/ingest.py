@@ -0,0 +1,124 @@
+"""Snapshot every restaurant/cafe in a region (default: Singapore) into a local PlaceIndex.
+
+Run from backend/:  python -m rec_engine.ingest [--region sg] [--out data/places_sg.json] [--update]
+"""
+import os
+import time
+import argparse
+from datetime import datetime, timezone
+from typing import List, Optional, Set, Tuple
+
+import numpy as np
+
+from .recommendation_engine import PlacesAPIClient, SINGAPORE_BBOX
+from .place_index import PlaceIndex
+from .place_table import PlaceTable
+from .regions import DEFAULT_REGIONS, Region, parse_regions
+
+DEFAULT_PLACES_TYPE = ["amenity=restaurant", "amenity=cafe"]
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+DEFAULT_INDEX_PATH = os.path.join(DATA_DIR, "places_sg.json")
+# Without an Overpass data timestamp, ask for changes since a bit before our last sync.
+# Re-applying an edit we already have is harmless, missing one isn't.
+SYNC_OVERLAP = 3600
+# A diff dropping more of the index than this is taken for a bad reply, not real deletions
+MAX_REMOVED_SHARE = 0.2
+
+
+def index_path(region: Region, data_dir: str = DATA_DIR) -> str:
+    """Where a region's snapshot lives, data/places_<name>.json"""
+    return os.path.join(data_dir, f"places_{region.name}.json")
+
+
+def snapshot_region(region: Region, path: str, client: PlacesAPIClient = None,
+                    places_type: List[str] = None) -> Optional[PlaceIndex]:
+    """Pull the whole region in one Overpass query, index it and save it to path.
+
+    Returns the new index, or None if the fetch failed (the old snapshot is kept).
+    """
+    client = client or PlacesAPIClient()
+    started = time.time()
+    places = client.search_bbox(region.bbox, places_type or DEFAULT_PLACES_TYPE, limit=None)
+    if not places:
+        print(f'❌ {region.name} snapshot returned no places, keeping the existing index')
+        return None
+
+    index = PlaceIndex(places, bbox=region.bbox)
+    index.save(path)
+    print(f'Indexed {len(index)} places in {region.name} in {time.time() - started:.1f}s -> {path}')
+    return index
+
+
+def apply_changes(index: PlaceIndex, changes: dict,
+                  max_removed_share: float = MAX_REMOVED_SHARE) -> Optional[PlaceIndex]:
+    """New index = unchanged rows of index + the changed places, deletions dropped.
+
+    The old index is left untouched so requests can keep using it until the swap.
+    Returns None if the diff would remove more than max_removed_share of the rows.
+    """
+    drop = changes['changed']
+    current = changes['current']
+    ids = index.places.ids
+    removed = sum(1 for place_id in ids if place_id not in current)
+    if len(ids) and removed > max_removed_share * len(ids):
+        return None
+    keep = np.array([row for row, place_id in enumerate(ids)
+                     if place_id in current and place_id not in drop], dtype=np.int64)
+    added = PlaceTable.from_places(
+        p for p in changes['places'] if p.get('lat') is not None and p.get('lon') is not None
+    )
+    return PlaceIndex(
+        PlaceTable.concat(index.places.take(keep), added),
+        bbox=index.bbox, built_at=index.built_at, cell_deg=index.cell_deg,
+        synced_at=time.time(), osm_base=changes['osm_base'],
+    )
+
+
+def update_region(index: PlaceIndex, path: str = DEFAULT_INDEX_PATH, client: PlacesAPIClient = None,
+                  places_type: List[str] = None, region: Region = None) -> Optional[Tuple[PlaceIndex, Set[str]]]:
+    """Bring index up to date with only the OSM edits since its last sync and save it to path.
+
+    A diff that would remove too much (see apply_changes) is refused and the region
+    (default: index's bbox) re-snapshotted instead, asking for the same diff again
+    would only get it refused again.
+    Returns (new index, ids of changed places), or None if the fetch failed (index is kept).
+    """
+    client = client or PlacesAPIClient()
+    started = time.time()
+    since = index.osm_base or datetime.fromtimestamp(index.synced_at - SYNC_OVERLAP, timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+    changes = client.fetch_changes(since, places_type or DEFAULT_PLACES_TYPE, bbox=index.bbox or SINGAPORE_BBOX)
+    if changes is None:
+        print('❌ Incremental place update failed, keeping the existing index')
+        return None
+
+    updated = apply_changes(index, changes)
+    if updated is None:
+        region = region or Region('index', index.bbox or SINGAPORE_BBOX)
+        print(f'⚠️ Diff since {since} would remove over {MAX_REMOVED_SHARE:.0%} of {len(index)} places, '
+              f'refused it, re-snapshotting {region.name}')
+        rebuilt = snapshot_region(region, path, client, places_type)
+        # every place counts as changed, only the ones whose description differs get re-embedded
+        return (rebuilt, set(rebuilt.places.ids)) if rebuilt is not None else None
+    updated.save(path)
+    removed = len(set(index.places.ids) - set(updated.places.ids))
+    print(f"Applied {len(changes['places'])} changed / {removed} removed places since {since} "
+          f"in {time.time() - started:.1f}s -> {len(updated)} places")
+    return updated, changes['changed']
+
+
+if __name__ == "__main__":
+    regions = {region.name: region for region in parse_regions(os.getenv('REC_REGIONS') or DEFAULT_REGIONS)}
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--region', default='sg' if 'sg' in regions else next(iter(regions)), choices=sorted(regions),
+                        help='one of REC_REGIONS')
+    parser.add_argument('--out', help='where to write the snapshot, default data/places_<region>.json')
+    parser.add_argument('--types', nargs='*', default=DEFAULT_PLACES_TYPE, help='tag filters, e.g. amenity=restaurant')
+    parser.add_argument('--update', action='store_true', help='only pull OSM edits since the existing snapshot')
+    args = parser.parse_args()
+    region = regions[args.region]
+    out = args.out or index_path(region)
+    existing = PlaceIndex.load(out) if args.update else None
+    if existing is not None:
+        update_region(existing, out, places_type=args.types, region=region)
+    else:
+        snapshot_region(region, out, places_type=args.types)
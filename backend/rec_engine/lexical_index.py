@@ -0,0 +1,88 @@
+import re
+import math
+from collections import Counter
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .embedding_matrix import top_k
+
+_TOKEN = re.compile(r'[a-z0-9]+')
+STOPWORDS = {'a', 'an', 'and', 'at', 'by', 'for', 'in', 'near', 'of', 'on', 'or', 'the', 'to', 'with'}
+# diet:<key>=yes/only is how OSM says "halal", "vegetarian" etc., index the key as a word
+DIET_VALUES = ('yes', 'only')
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase alphanumeric words, stopwords dropped and plural 's' folded ('noodles' -> 'noodle')"""
+    tokens = []
+    for token in _TOKEN.findall((text or '').lower()):
+        if token in STOPWORDS:
+            continue
+        if len(token) > 3 and token.endswith('s') and not token.endswith('ss'):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+def place_text(place: Dict, description: str) -> str:
+    """What a place is matched on: its description (name, cuisine, amenity, address) plus diet tags"""
+    tags = place.get('tags') or {}
+    diets = [key[5:] for key, value in tags.items() if key.startswith('diet:') and value in DIET_VALUES]
+    return ' '.join([description, tags.get('cuisine', ''), *diets])
+
+
+class LexicalIndex:
+    """BM25 inverted index over place texts, one document per row of an EmbeddingMatrix.
+
+    Each term's postings hold the rows it appears in and their precomputed BM25
+    weight, so scoring a query is a scatter-add per query term.
+    """
+
+    def __init__(self, texts: Sequence[str], places: Sequence[Dict] = None, k1: float = 1.2, b: float = 0.75):
+        # the places the rows belong to, compared by identity with the matrix they're ranked against
+        self.places = places
+        self.size = len(texts)
+        docs = [Counter(tokenize(text)) for text in texts]
+        lengths = np.array([sum(doc.values()) for doc in docs], dtype=np.float32)
+        avg_length = float(lengths.mean()) if len(docs) and lengths.mean() > 0 else 1.0
+
+        rows_of: Dict[str, List[int]] = {}
+        tf_of: Dict[str, List[int]] = {}
+        for row, doc in enumerate(docs):
+            for term, tf in doc.items():
+                rows_of.setdefault(term, []).append(row)
+                tf_of.setdefault(term, []).append(tf)
+
+        self.postings: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        for term, rows in rows_of.items():
+            rows = np.array(rows, dtype=np.int32)
+            tf = np.array(tf_of[term], dtype=np.float32)
+            idf = math.log(1 + (self.size - len(rows) + 0.5) / (len(rows) + 0.5))
+            weight = idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * lengths[rows] / avg_length))
+            self.postings[term] = (rows, weight.astype(np.float32))
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def nbytes(self) -> int:
+        return sum(rows.nbytes + weight.nbytes for rows, weight in self.postings.values())
+
+    def search(self, query: str, k: int, mask: np.ndarray = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k (rows, BM25 scores) matching at least one query term, only rows where mask is True"""
+        scores: Optional[np.ndarray] = None
+        for term in set(tokenize(query)):
+            posting = self.postings.get(term)
+            if posting is None:
+                continue
+            if scores is None:
+                scores = np.zeros(self.size, dtype=np.float32)
+            rows, weight = posting
+            scores[rows] += weight
+        if scores is None:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        if mask is not None:
+            scores[~mask] = 0
+        hits = np.flatnonzero(scores)
+        return top_k(scores[hits], k, hits)
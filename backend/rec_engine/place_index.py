@@ -0,0 +1,128 @@
+import os
+import json
+import math
+import time
+from collections import defaultdict
+from typing import List, Dict, Optional, Tuple, Union
+
+import numpy as np
+
+from .filters import FilterColumns
+from .place_table import PlaceTable
+
+EARTH_RADIUS_M = 6371000.0
+METERS_PER_DEG_LAT = 111320.0
+
+
+def haversine_m(lat: float, lon: float, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    """Great-circle distance in metres from (lat, lon) to every point in lats/lons"""
+    lat1, lon1 = math.radians(lat), math.radians(lon)
+    lat2, lon2 = np.radians(lats), np.radians(lons)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(a))
+
+
+class PlaceIndex:
+    """In-memory spatial index over a snapshot of places.
+
+    Places are bucketed into a fixed lat/lon grid; a radius query only looks at
+    the cells overlapping the search circle and then filters by haversine distance.
+    """
+
+    def __init__(self, places: Union[List[Dict], PlaceTable], bbox: Tuple[float, float, float, float] = None,
+                 built_at: float = None, cell_deg: float = 0.01, synced_at: float = None, osm_base: str = None):
+        if not isinstance(places, PlaceTable):
+            # Places without coordinates can't be searched spatially
+            places = PlaceTable.from_places(
+                p for p in places if p.get('lat') is not None and p.get('lon') is not None
+            )
+        # columnar store, rows are only turned into dicts for results
+        self.places = places
+        self.lats = places.lat
+        self.lons = places.lon
+        self.bbox = bbox  # (min_lat, min_lon, max_lat, max_lon) the snapshot was taken over
+        self.built_at = built_at or time.time()  # last full snapshot
+        # last incremental update, and the Overpass data timestamp it reflects (see ingest.update_region)
+        self.synced_at = synced_at or self.built_at
+        self.osm_base = osm_base
+        self.cell_deg = cell_deg
+        # price/rating/bookable/amenity columns, built once per snapshot
+        self.filters = FilterColumns.from_table(self.places)
+
+        cells = defaultdict(list)
+        cell_lat = np.floor(self.lats / cell_deg).astype(np.int64)
+        cell_lon = np.floor(self.lons / cell_deg).astype(np.int64)
+        for i, cell in enumerate(zip(cell_lat.tolist(), cell_lon.tolist())):
+            cells[cell].append(i)
+        self._cells = {cell: np.array(rows, dtype=np.int64) for cell, rows in cells.items()}
+
+    def __len__(self):
+        return len(self.places)
+
+    def _cell(self, lat: float, lon: float) -> Tuple[int, int]:
+        return int(math.floor(lat / self.cell_deg)), int(math.floor(lon / self.cell_deg))
+
+    def covers(self, lat: float, lon: float) -> bool:
+        """True if the point lies inside the area this snapshot was built from"""
+        if self.bbox is None:
+            return True
+        min_lat, min_lon, max_lat, max_lon = self.bbox
+        return min_lat <= lat <= max_lat and min_lon <= lon <= max_lon
+
+    def age_seconds(self) -> float:
+        return time.time() - self.built_at
+
+    def sync_age_seconds(self) -> float:
+        return time.time() - self.synced_at
+
+    def query_radius(self, lat: float, lon: float, radius: float) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (row indices, distances in metres) of places within radius, nearest first"""
+        dlat = radius / METERS_PER_DEG_LAT
+        dlon = radius / (METERS_PER_DEG_LAT * max(math.cos(math.radians(lat)), 1e-6))
+        lat_lo, lon_lo = self._cell(lat - dlat, lon - dlon)
+        lat_hi, lon_hi = self._cell(lat + dlat, lon + dlon)
+
+        buckets = [
+            self._cells[(i, j)]
+            for i in range(lat_lo, lat_hi + 1)
+            for j in range(lon_lo, lon_hi + 1)
+            if (i, j) in self._cells
+        ]
+        if not buckets:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+
+        rows = np.concatenate(buckets)
+        distances = haversine_m(lat, lon, self.lats[rows], self.lons[rows])
+        inside = distances <= radius
+        rows, distances = rows[inside], distances[inside]
+        order = np.argsort(distances, kind='stable')
+        return rows[order], distances[order]
+
+    def save(self, path: str):
+        """Write the snapshot as JSON (atomically, so readers never see half a file)"""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'built_at': self.built_at,
+                'synced_at': self.synced_at,
+                'osm_base': self.osm_base,
+                'bbox': self.bbox,
+                'places': list(self.places),
+            }, f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> Optional['PlaceIndex']:
+        """Load a snapshot written by save(), returns None if there isn't a usable one"""
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f'❌ Could not load place index {path}: {e}')
+            return None
+        bbox = tuple(data['bbox']) if data.get('bbox') else None
+        return cls(data.get('places', []), bbox=bbox, built_at=data.get('built_at'),
+                   synced_at=data.get('synced_at'), osm_base=data.get('osm_base'))
@@ -0,0 +1,207 @@
+import sys
+from typing import List, Dict, Iterable, Iterator
+
+import numpy as np
+
+from .filters import price_level_of, rating_of
+
+OSM_TYPES = ('node', 'way', 'relation')
+# Tags most places have, stored as int32 codes into a shared string pool (-1 = missing)
+CODED_TAGS = ('name', 'amenity', 'cuisine', 'addr:street', 'addr:housenumber',
+              'addr:postcode', 'addr:city', 'addr:housename')
+# "yes"-valued tags stored as one bit each; any other value goes to the side store
+FLAG_TAGS = ('wifi', 'outdoor_seating', 'indoor_seating', 'wheelchair', 'reservation',
+             'delivery', 'takeaway', 'bookable')
+
+CORE_FEATURES = ['cuisine', 'amenity', 'name', 'website', 'indoor_seating', 'outdoor_seating',
+                 'indoor_seating', 'wheelchair', 'takeaway']
+ADDRESS_KEYS = ['addr:street', 'addr:housename', 'addr:housenumber', 'addr:postcode', 'addr:city', 'name']
+# Tags something downstream actually reads (descriptions, enrichment, filters).
+# Anything else is left out of the side store.
+CONSUMED_TAG_KEYS = {
+    'name', 'amenity', 'cuisine', 'website', 'phone', 'opening_hours',
+    'indoor_seating', 'outdoor_seating', 'wheelchair', 'takeaway', 'delivery',
+    'wifi', 'internet_access', 'reservation', 'bookable', 'price_level', 'rating',
+}
+CONSUMED_TAG_PREFIXES = ('addr:', 'contact:', 'diet:')
+
+
+def place_type(tags: Dict[str, str]) -> Dict[str, str]:
+    """determine the main features of place from tags, returns Dict[str,str]"""
+    return {tag: tags[tag] for tag in CORE_FEATURES if tag in tags}
+
+
+def make_place(place_id: str, tags: Dict[str, str], lat: float, lon: float) -> Dict:
+    """The place dict shape the rest of the app works with"""
+    place = {
+        'id': place_id,
+        'name': tags['name'],
+        'type': place_type(tags),
+        'tags': tags,
+        'lat': lat,
+        'lon': lon
+    }
+    #add address
+    address = {key: tags[key] for key in ADDRESS_KEYS if key in tags}
+    if address:
+        place['address'] = address
+    return place
+
+
+class PlaceTable:
+    """Columnar, read-only store of places.
+
+    Coordinates, price level, rating and OSM ids are NumPy columns, common tags
+    are codes into one interned string pool, "yes" tags are bits, and any other
+    tag something reads (CONSUMED_TAG_KEYS) lives in a per-row side store. Rows are only turned back into place
+    dicts (see make_place) when asked for with table[row].
+    """
+
+    def __init__(self, osm_type: np.ndarray, osm_id: np.ndarray, lat: np.ndarray, lon: np.ndarray,
+                 codes: Dict[str, np.ndarray], flags: np.ndarray, price_level: np.ndarray,
+                 rating: np.ndarray, extra: Dict[int, Dict[str, str]], strings: List[str]):
+        self.osm_type = osm_type
+        self.osm_id = osm_id
+        self.lat = lat
+        self.lon = lon
+        self.codes = codes
+        self.flags = flags
+        self.price_level = price_level
+        self.rating = rating
+        self.extra = extra
+        self.strings = strings
+        self._ids = None
+
+    @classmethod
+    def from_places(cls, places: Iterable[Dict]) -> 'PlaceTable':
+        """Build from place dicts with OSM style ids ('node_123') and lat/lon set"""
+        places = list(places)
+        n = len(places)
+        strings, code_of = [], {}
+
+        def intern(value: str) -> int:
+            code = code_of.get(value)
+            if code is None:
+                code = code_of[value] = len(strings)
+                strings.append(sys.intern(value))
+            return code
+
+        osm_type = np.empty(n, dtype=np.uint8)
+        osm_id = np.empty(n, dtype=np.int64)
+        codes = {key: np.full(n, -1, dtype=np.int32) for key in CODED_TAGS}
+        flags = np.zeros(n, dtype=np.uint16)
+        extra = {}
+        for row, place in enumerate(places):
+            kind, _, number = place['id'].partition('_')
+            osm_type[row] = OSM_TYPES.index(kind)
+            osm_id[row] = int(number)
+
+            tags = dict(place.get('tags') or {})
+            tags.setdefault('name', place.get('name', ''))
+            for key in CODED_TAGS:
+                if key in tags:
+                    codes[key][row] = intern(tags.pop(key))
+            for bit, key in enumerate(FLAG_TAGS):
+                if tags.get(key) == 'yes':
+                    flags[row] |= 1 << bit
+                    del tags[key]
+            # this is the one pass over the leftover tags, drop the unread ones here
+            tags = {sys.intern(k): sys.intern(v) for k, v in tags.items()
+                    if k in CONSUMED_TAG_KEYS or k.startswith(CONSUMED_TAG_PREFIXES)}
+            if tags:
+                extra[row] = tags
+
+        return cls(
+            osm_type, osm_id,
+            np.array([p['lat'] for p in places], dtype=np.float64),
+            np.array([p['lon'] for p in places], dtype=np.float64),
+            codes, flags,
+            np.array([price_level_of(p) for p in places], dtype=np.int8),
+            np.array([rating_of(p) for p in places], dtype=np.float32),
+            extra, strings
+        )
+
+    def __len__(self):
+        return len(self.osm_id)
+
+    def __iter__(self) -> Iterator[Dict]:
+        return (self[row] for row in range(len(self)))
+
+    def place_id(self, row: int) -> str:
+        return f"{OSM_TYPES[self.osm_type[row]]}_{self.osm_id[row]}"
+
+    @property
+    def ids(self) -> List[str]:
+        if self._ids is None:
+            self._ids = [self.place_id(row) for row in range(len(self))]
+        return self._ids
+
+    def tags(self, row: int) -> Dict[str, str]:
+        """Reassemble the (lean) OSM tags of one row"""
+        tags = {}
+        for key, column in self.codes.items():
+            code = column[row]
+            if code >= 0:
+                tags[key] = self.strings[code]
+        bits = int(self.flags[row])
+        if bits:
+            for bit, key in enumerate(FLAG_TAGS):
+                if bits & (1 << bit):
+                    tags[key] = 'yes'
+        tags.update(self.extra.get(row, ()))
+        return tags
+
+    def __getitem__(self, row: int) -> Dict:
+        row = int(row)
+        return make_place(self.place_id(row), self.tags(row), float(self.lat[row]), float(self.lon[row]))
+
+    def has_flag(self, key: str) -> np.ndarray:
+        """Boolean column: tag key == 'yes'"""
+        return (self.flags & (1 << FLAG_TAGS.index(key))) != 0
+
+    def take(self, rows: np.ndarray) -> 'PlaceTable':
+        """A new table with just these rows (sharing the string pool)"""
+        rows = np.asarray(rows, dtype=np.int64)
+        extra = {}
+        for new_row, row in enumerate(rows):
+            tags = self.extra.get(int(row))
+            if tags:
+                extra[new_row] = tags
+        return PlaceTable(
+            self.osm_type[rows], self.osm_id[rows], self.lat[rows], self.lon[rows],
+            {key: column[rows] for key, column in self.codes.items()},
+            self.flags[rows], self.price_level[rows], self.rating[rows], extra, self.strings
+        )
+
+    @classmethod
+    def concat(cls, first: 'PlaceTable', second: 'PlaceTable') -> 'PlaceTable':
+        """Rows of first followed by rows of second, in one string pool"""
+        strings = list(first.strings)
+        code_of = {value: code for code, value in enumerate(strings)}
+        remap = np.empty(len(second.strings) + 1, dtype=np.int32)
+        remap[-1] = -1  # code -1 (missing) indexes the last slot
+        for code, value in enumerate(second.strings):
+            if value not in code_of:
+                code_of[value] = len(strings)
+                strings.append(value)
+            remap[code] = code_of[value]
+
+        offset = len(first)
+        extra = dict(first.extra)
+        extra.update((row + offset, tags) for row, tags in second.extra.items())
+        return cls(
+            np.concatenate([first.osm_type, second.osm_type]), np.concatenate([first.osm_id, second.osm_id]),
+            np.concatenate([first.lat, second.lat]), np.concatenate([first.lon, second.lon]),
+            {key: np.concatenate([first.codes[key], remap[second.codes[key]]]) for key in CODED_TAGS},
+            np.concatenate([first.flags, second.flags]),
+            np.concatenate([first.price_level, second.price_level]),
+            np.concatenate([first.rating, second.rating]),
+            extra, strings
+        )
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate size of the NumPy columns (not counting the string pool / side store)"""
+        arrays = [self.osm_type, self.osm_id, self.lat, self.lon, self.flags, self.price_level, self.rating,
+                  *self.codes.values()]
+        return sum(a.nbytes for a in arrays)
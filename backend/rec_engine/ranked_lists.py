@@ -0,0 +1,153 @@
+import json
+import math
+import time
+import base64
+import binascii
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+
+from .filters import FilterColumns
+from .place_index import haversine_m
+from .place_table import PlaceTable
+from .result_cache import normalize_query, snap
+
+
+class RankedList:
+    """Every candidate of one search (location cell, query, radius), best match first, with its
+    match score.
+
+    Neither filters nor the user's exact position are part of it: requests up to a cell
+    apart share the list, so page() masks it with the request's filters, measures
+    distances from the request's own location, cuts at its radius and blends proximity
+    in. Changing any of those never goes back to the model.
+    """
+
+    def __init__(self, places: PlaceTable, scores: np.ndarray):
+        self.places = places
+        self.scores = np.asarray(scores, dtype=np.float32)
+        self.filters = FilterColumns.from_table(places)
+
+    def __len__(self):
+        return len(self.places)
+
+    @property
+    def nbytes(self) -> int:
+        return self.places.nbytes + self.scores.nbytes
+
+    def page(self, filters: Dict, offset: int, limit: int, lat: float = None, lon: float = None,
+             radius: float = None, blend: Callable[[np.ndarray, np.ndarray], np.ndarray] = None
+             ) -> Tuple[List[Dict], Optional[int]]:
+        """(raw recommendations offset..offset+limit among the places passing filters, offset of the next page or None).
+
+        With lat/lon every place gets its distance_m from there, places beyond radius are
+        dropped and blend(scores, distances) re-orders them (it's deterministic, so
+        pages of one request line up)."""
+        keep = self.filters.mask(**filters)
+        scores, distances = self.scores, None
+        if lat is not None:
+            distances = haversine_m(lat, lon, self.places.lat, self.places.lon)
+            if radius is not None:
+                keep &= distances <= radius
+            if blend is not None:
+                scores = blend(scores, distances)
+        rows = np.flatnonzero(keep)
+        if scores is not self.scores:
+            # stable, so ties keep the match order
+            rows = rows[np.argsort(-scores[rows], kind='stable')]
+        end = offset + limit
+        # similarity_score is the match against the query, score what the page is ordered by
+        page = [dict(self.places[row], similarity_score=float(self.scores[row]), score=float(scores[row]))
+                for row in rows[offset:end]]
+        if distances is not None:
+            for place, row in zip(page, rows[offset:end]):
+                place['distance_m'] = float(distances[row])
+        return page, end if end < len(rows) else None
+
+
+class RankedListCache:
+    """Short-lived RankedLists by (location cell, normalised query, radius), LRU over max_bytes with a TTL.
+
+    Like ResultCache, invalidate() drops everything when the place index changes
+    and put() refuses a list ranked against the old one.
+    """
+
+    def __init__(self, max_bytes: int = 64_000_000, ttl: float = 300, grid_m: float = 100):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.grid_m = grid_m
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._nbytes = 0
+        self._entries: 'OrderedDict[Hashable, Tuple[float, RankedList]]' = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def nbytes(self) -> int:
+        return self._nbytes
+
+    def make_key(self, lat: float, lon: float, query: str, radius: float = None) -> Hashable:
+        return snap(lat, lon, self.grid_m), normalize_query(query), radius
+
+    @property
+    def reach(self) -> float:
+        """How far apart two locations sharing a key can be (metres), a list for radius r
+        has to hold every place within r + reach of the first requester"""
+        return self.grid_m * math.sqrt(2)
+
+    def get(self, key: Hashable) -> Optional[RankedList]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.time() - entry[0] > self.ttl:
+                self._drop(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Hashable, ranked: RankedList, generation: int = None):
+        """Store a list, unless it was ranked before the last invalidate() or alone exceeds max_bytes"""
+        if ranked.nbytes > self.max_bytes:
+            return
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (time.time(), ranked)
+            self._nbytes += ranked.nbytes
+            while self._nbytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+
+    def _drop(self, key: Hashable):
+        _, ranked = self._entries.pop(key)
+        self._nbytes -= ranked.nbytes
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+            self._nbytes = 0
+            self.generation += 1
+
+
+def encode_cursor(state: Dict) -> str:
+    """Opaque, URL-safe token for the next page of a search"""
+    return base64.urlsafe_b64encode(json.dumps(state, separators=(',', ':')).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Optional[Dict]:
+    """State passed to encode_cursor, None if the token is malformed"""
+    try:
+        state = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (ValueError, binascii.Error):
+        return None
+    return state if isinstance(state, dict) else None
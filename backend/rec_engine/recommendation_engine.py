@@ -1,26 +1,67 @@
+import os
+import re
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import numpy as np
 import time
-from typing import List, Dict, Any, Optional, Tuple, Union
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Set, Tuple, Union
 from dataclasses import dataclass, field
 import json
+from urllib.parse import urlparse
 
 # Geopy for geocoding
 from geopy.geocoders import Nominatim
 from geopy.extra.rate_limiter import RateLimiter
 
 
-# Sentence Transformer for modelling
-from sentence_transformers import SentenceTransformer
+# Sentence Transformer models (and their CPU backends) for modelling
+from .encoders import load_encoder, store_namespace
+from .embedding_store import EmbeddingStore, make_key
+from .embedding_matrix import EmbeddingMatrix, normalize_rows, place_ids, top_k
+from .batching import BatchingEncoder
+from .inference_server import RemoteEncoder
+from .lexical_index import LexicalIndex, place_text
+from .metrics import UPSTREAM_ERRORS, stage
+from .geotile_cache import GeotileCache, covering_tiles, geohash_encode, merge_bbox
+from .geocode_cache import GeocodeCache, OfflineReverseGeocoder
+from .place_index import haversine_m
+from .place_table import make_place, place_type
+
+# Format: (min_lat, min_lon, max_lat, max_lon)
+SINGAPORE_BBOX = (1.1496, 103.5940, 1.4784, 104.0945)
+
+class OverpassError(RuntimeError):
+    """Overpass answered 200 but says the query failed (timeout, out of memory...)"""
+
+
+def raise_for_remark(data: Dict) -> Dict:
+    """data, unless Overpass put a remark in it: its elements are then missing or cut short"""
+    remark = data.get('remark')
+    if remark:
+        raise OverpassError(remark)
+    return data
 
-# sklearn for cosine similarity
-from sklearn.metrics.pairwise import cosine_similarity
 
 class Geocoder:
     """Handles address to coordinates conversion and vice versa"""
     
-    def __init__(self, user_agent: str = "recommendation_engine"):
-        self.geolocator = Nominatim(user_agent=user_agent)
+    def __init__(self, user_agent: str = "recommendation_engine", url: str = None,
+                 cache: GeocodeCache = None, offline: OfflineReverseGeocoder = None):
+        # Nominatim allows 1 req/s: addresses seen before are answered from the cache,
+        # coordinates inside the offline geocoder's area never go to the network
+        self.cache = cache
+        self.offline = offline
+        # url (or NOMINATIM_URL) points at another Nominatim, e.g. http://127.0.0.1:8089 for benchmarks
+        url = url or os.getenv("NOMINATIM_URL")
+        if url:
+            parsed = urlparse(url)
+            self.geolocator = Nominatim(user_agent=user_agent, domain=parsed.netloc, scheme=parsed.scheme)
+        else:
+            self.geolocator = Nominatim(user_agent=user_agent)
         
         # Rate limited geocoding to respect API limits
         self._geocode = RateLimiter(
@@ -41,25 +82,38 @@ class Geocoder:
 
     def geocode(self, query: str, limit: int = 1):
         """Convert address to coordinates and address details"""
+        cache = self.cache
+        if cache is not None:
+            found, result = cache.get(query)
+            if found:
+                return result
         try:
-            location = self._geocode(query, exactly_one=True, addressdetails=True)
-            if not location:
-                return None
-                        
-            return {
+            with stage('geocode'):
+                location = self._geocode(query, exactly_one=True, addressdetails=True)
+            result = {
                 'lat': location.latitude,
                 'lon': location.longitude,
                 'display_name': location.address,
-            }
+            } if location else None
+            if cache is not None:
+                cache.put(query, result)  # misses too, errors below aren't cached
+            return result
             
         except Exception as e:
             print(f'❌ Geocoding error: {e}')
+            UPSTREAM_ERRORS.inc(upstream='nominatim')
             return None
     
     def reverse_geocode(self, lat: float, lon: float):
         """Convert coordinates to address details"""
+        offline = self.offline
+        if offline is not None:
+            result = offline.reverse(lat, lon)
+            if result is not None:
+                return result
         try:
-            location = self._reverse_geocode((lat, lon), exactly_one=True, addressdetails=True)
+            with stage('reverse_geocode'):
+                location = self._reverse_geocode((lat, lon), exactly_one=True, addressdetails=True)
             if not location:
                 return None
 
@@ -72,13 +126,14 @@ class Geocoder:
             
         except Exception as e:
             print(f'❌ Reverse geocoding error: {e}')
+            UPSTREAM_ERRORS.inc(upstream='nominatim')
             return None
 
 class LocationManager:
     """Handles different types of location inputs"""
     
-    def __init__(self):
-        self.geocoder = Geocoder()
+    def __init__(self, geocoder: Geocoder = None):
+        self.geocoder = geocoder or Geocoder()
         
     def process_location_input(self, location_input: Union[str, Tuple[float, float], Dict]) -> Optional[Dict]:
         """Process various location input formats"""
@@ -171,16 +226,99 @@ def test_geocoder():
 
 
 class PlacesAPIClient:
-    def __init__(self,overpass_endpoint: str= 'https://overpass-api.de/api/interpreter'):
+    # Overpass answers these when it is overloaded, worth a retry
+    RETRY_STATUSES = (429, 502, 503, 504)
+
+    def __init__(self,overpass_endpoint: str= 'https://overpass-api.de/api/interpreter', timeout: float = 30.0, retries: int = 2,
+                 tile_cache: GeotileCache = None, lean: bool = True):
         self.overpass_endpoint=overpass_endpoint
+        # lean=True asks Overpass for just the matched elements (see _build_lean_query),
+        # lean=False keeps the original node/way/relation + recursion query shape
+        self.lean=lean
         self.geocoder=Geocoder()
+        self.timeout=timeout
+        # When set, search_nearby is answered from cached geohash tiles
+        self.tile_cache=tile_cache
+        self._refresh_pool=None
+
+        # One pooled keep-alive session instead of a new connection per query
+        self.session = requests.Session()
+        self.session.headers.update({'Accept-Encoding': 'gzip, deflate'})
+        retry = Retry(
+            total=retries,
+            backoff_factor=0.5,
+            status_forcelist=self.RETRY_STATUSES,
+            allowed_methods=frozenset(['POST']),
+            raise_on_status=False
+        )
+        self.session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=10, max_retries=retry))
+        self.session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=10, max_retries=retry))
 
 
+    def _build_lean_query(self, area: str, places_type: List[str], limit: Optional[int], timeout: int) -> str:
+        """Payload-minimising query: one nwr clause per tag key, no member recursion.
+
+        Nodes are printed with their coordinates, ways/relations only with tags and
+        a centre point, which is everything _process_elements reads.
+        """
+        out_limit = f" {limit}" if limit else ""
+        return "\n".join([
+            f"[out:json][timeout:{timeout}];",
+            "(",
+            *self._lean_clauses(area, places_type),
+            ")->.hits;",
+            "node.hits;",
+            f"out body qt{out_limit};",
+            "(way.hits; relation.hits;);",
+            f"out tags center qt{out_limit};",
+        ])
+
+    def _lean_clauses(self, area: str, places_type: List[str]) -> List[str]:
+        """One nwr statement per tag key, e.g. nwr(area)["amenity"~"^(restaurant|cafe)$"];"""
+        values_by_key = {}
+        for place in places_type:
+            if '=' in place:
+                k, v = place.split('=', 1)
+            else:
+                k, v = 'amenity', place  # Default to amenity if no key specified
+            values_by_key.setdefault(k, []).append(v)
+
+        clauses = []
+        for k, values in values_by_key.items():
+            if len(values) == 1:
+                tag_filter = f'["{k}"="{values[0]}"]'
+            else:
+                tag_filter = f'["{k}"~"^({"|".join(re.escape(v) for v in values)})$"]'
+            clauses.append(f"  nwr{area}{tag_filter};")
+        return clauses
+
+    def _build_changes_query(self, bbox: Tuple[float, float, float, float], places_type: List[str], since: str,
+                             timeout: int = 60) -> str:
+        """Elements matching places_type in bbox edited after since (ISO 8601), then the ids of every match.
+
+        The second output is what lets the caller spot deletions and elements
+        that stopped matching, newer: alone only returns what still exists.
+        """
+        area = f"({bbox[0]},{bbox[1]},{bbox[2]},{bbox[3]})"
+        return "\n".join([
+            f"[out:json][timeout:{timeout}];",
+            "(",
+            *self._lean_clauses(area, places_type),
+            ")->.hits;",
+            f'nwr.hits(newer:"{since}")->.changed;',
+            "node.changed;",
+            "out body qt;",
+            "(way.changed; relation.changed;);",
+            "out tags center qt;",
+            ".hits out ids qt;",
+        ])
 
     def _build_overpass_query(self, lat: float, lon: float, radius: int, places_type: List[str], limit: int) -> str:
         """Constructs raw Overpass QL query string"""
         if not places_type:
             places_type = ['amenity', 'tourism', 'shop', 'leisure']
+        if self.lean and all('=' in place for place in places_type):
+            return self._build_lean_query(f"(around:{radius},{lat},{lon})", places_type, limit, timeout=25)
         
         # Build individual queries for each place type
         queries = []
@@ -210,48 +348,154 @@ class PlacesAPIClient:
         
         return "\n".join(query_parts)
 
-    def search_nearby(self, location: Union[str, Tuple[float, float]], radius: int = 1000, places_type: List[str] = None, limit: int = 50):
-        """Entry method: geocodes and runs the query, returns List[Dict] else returns [] if error"""
+    def _resolve_location(self, location: Union[str, Tuple[float, float]]) -> Tuple[float, float]:
+        """Turn an address string or (lat, lon) pair into coordinates"""
         if isinstance(location, str):
             geocode_result = self.geocoder.geocode(location)
             if not geocode_result:
                 raise ValueError(f"Could not geocode location: {location}")
             lat, lon = float(geocode_result['lat']), float(geocode_result['lon'])
             print(f'Successfully geocoded forward location: {location} to coordinates lat/lon: {lat}/{lon}')
+            return lat, lon
         elif isinstance(location, (tuple, list)) and len(location) == 2:
             lat, lon = map(float, location)
-        else:
-            raise ValueError("Location must be an address string or (lat, lon) tuple")
+            return lat, lon
+        raise ValueError("Location must be an address string or (lat, lon) tuple")
 
-        query = self._build_overpass_query(lat, lon, radius, places_type or [], limit)
-        #print("Generated query:\n", query)  # debuug
-        
-        try:
-            response = requests.post(
+    def _parse_response(self, data: Dict) -> List[Dict]:
+        if 'elements' not in data:
+            print("No elements found in response")
+            return []
+        with stage('parse'):
+            return self._process_elements(data['elements'])
+
+    def _post(self, query: str, timeout: float = None) -> Dict:
+        """POST a query to Overpass and return the decoded JSON, raises on any error"""
+        with stage('overpass'):
+            response = self.session.post(
                 self.overpass_endpoint,
                 data=query,
-                headers={'Content-Type': 'text/plain'}
+                headers={'Content-Type': 'text/plain'},
+                timeout=timeout or self.timeout
             )
             response.raise_for_status()
-            data = response.json()
-            if 'elements' not in data:
-                print("No elements found in response")
-                return []
-            return self._process_elements(data['elements'])
+            return raise_for_remark(response.json())
+
+    def _fetch_places(self, query: str, timeout: float = None) -> List[Dict]:
+        """POST a query to Overpass and process it, raises on any error"""
+        return self._parse_response(self._post(query, timeout))
+
+    def _report_error(self, e: Exception):
+        print(f'Error with Overpass API: {e}')
+        UPSTREAM_ERRORS.inc(upstream='overpass')
+        if hasattr(e, 'response') and e.response is not None:
+            try:
+                print(f'Response: {e.response.text}')
+            except:
+                print("Could not decode error response")
+
+    def _run_query(self, query: str, timeout: float = None) -> List[Dict]:
+        """POST a query to Overpass, returns processed places or [] on error"""
+        try:
+            return self._fetch_places(query, timeout)
         except Exception as e:
-            print(f'Error with Overpass API: {e}')
-            if hasattr(e, 'response') and e.response is not None:
-                try:
-                    print(f'Response: {e.response.text}')
-                except:
-                    print("Could not decode error response")
+            self._report_error(e)
             return []
-        
-    def _build_sg_query(self,places_type: List[str]= None,limit: int= 50):
-        if not places_type:
-            places_type=["amenity=restaurant", "amenity=cafe"]
-        # Format: (min_lat, min_lon, max_lat, max_lon)
-        singapore_bbox= (1.1496, 103.5940, 1.4784, 104.0945)
+
+    def search_nearby(self, location: Union[str, Tuple[float, float]], radius: int = 1000, places_type: List[str] = None, limit: int = 50):
+        """Entry method: geocodes and runs the query, returns List[Dict] else returns [] if error"""
+        lat, lon = self._resolve_location(location)
+
+        if self.tile_cache is not None and places_type:
+            return self._search_tiles(lat, lon, radius, places_type, limit)
+
+        query = self._build_overpass_query(lat, lon, radius, places_type or [], limit)
+        #print("Generated query:\n", query)  # debuug
+        # lean queries apply the limit to nodes and ways separately
+        return self._run_query(query)[:limit]
+
+    # ---- geotile cache -------------------------------------------------
+
+    def _tile_key(self, tile: str, places_type: List[str]) -> str:
+        return f"{tile}|{','.join(sorted(places_type))}"
+
+    def _lookup_tiles(self, lat: float, lon: float, radius: int, places_type: List[str]):
+        """Split the tiles covering a search into (cached places lists, missing tiles, stale tiles)"""
+        cached, missing, stale = [], [], []
+        for tile in covering_tiles(lat, lon, radius, self.tile_cache.precision):
+            places, state = self.tile_cache.get(self._tile_key(tile, places_type))
+            if places is None:
+                missing.append(tile)
+                continue
+            cached.append(places)
+            if state == GeotileCache.STALE:
+                stale.append(tile)
+        return cached, missing, stale
+
+    def _tiles_query(self, tiles: List[str], places_type: List[str]) -> str:
+        return self._build_bbox_query(merge_bbox(tiles), places_type, limit=None, timeout=25)
+
+    def _store_tiles(self, tiles: List[str], places: List[Dict], places_type: List[str]) -> List[List[Dict]]:
+        """Split a fetch over several tiles back into per-tile cache entries"""
+        by_tile = {tile: [] for tile in tiles}
+        for place in places:
+            if place.get('lat') is None or place.get('lon') is None:
+                continue
+            tile = geohash_encode(place['lat'], place['lon'], self.tile_cache.precision)
+            if tile in by_tile:
+                by_tile[tile].append(place)
+        for tile, tile_places in by_tile.items():
+            self.tile_cache.put(self._tile_key(tile, places_type), tile_places)
+        return list(by_tile.values())
+
+    def _refresh_tiles(self, tiles: List[str], places_type: List[str]):
+        keys = [self._tile_key(tile, places_type) for tile in tiles]
+        try:
+            self._store_tiles(tiles, self._fetch_places(self._tiles_query(tiles, places_type)), places_type)
+        except Exception as e:
+            self._report_error(e)
+            self.tile_cache.release_refresh(keys)
+
+    def _claim_stale(self, stale: List[str], places_type: List[str]) -> List[str]:
+        """Stale tiles this caller should refresh (others are already being refreshed)"""
+        keys = {self._tile_key(tile, places_type): tile for tile in stale}
+        return [keys[key] for key in self.tile_cache.claim_refresh(list(keys))]
+
+    def _merge_tiles(self, lat: float, lon: float, radius: int, tiles: List[List[Dict]], limit: int) -> List[Dict]:
+        """Union tile contents and keep what is really within radius, nearest first"""
+        merged = {}
+        for tile_places in tiles:
+            for place in tile_places:
+                merged[place['id']] = place
+        places = list(merged.values())
+        if not places:
+            return []
+        distances = haversine_m(lat, lon, np.array([p['lat'] for p in places]), np.array([p['lon'] for p in places]))
+        order = [i for i in np.argsort(distances, kind='stable') if distances[i] <= radius]
+        return [places[i] for i in order[:limit]]
+
+    def _search_tiles(self, lat: float, lon: float, radius: int, places_type: List[str], limit: int) -> List[Dict]:
+        cached, missing, stale = self._lookup_tiles(lat, lon, radius, places_type)
+        if missing:
+            # one upstream call for all missing tiles
+            try:
+                fetched = self._fetch_places(self._tiles_query(missing, places_type))
+                cached.extend(self._store_tiles(missing, fetched, places_type))
+            except Exception as e:
+                self._report_error(e)
+        claimed = self._claim_stale(stale, places_type)
+        if claimed:
+            if self._refresh_pool is None:
+                self._refresh_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix='tile-refresh')
+            self._refresh_pool.submit(self._refresh_tiles, claimed, places_type)
+        return self._merge_tiles(lat, lon, radius, cached, limit)
+
+    # ---------------------------------------------------------------------
+
+    def _build_bbox_query(self, bbox: Tuple[float, float, float, float], places_type: List[str], limit: Optional[int] = None, timeout: int = 25) -> str:
+        """Query everything matching places_type inside bbox = (min_lat, min_lon, max_lat, max_lon)"""
+        if self.lean:
+            return self._build_lean_query(f"({bbox[0]},{bbox[1]},{bbox[2]},{bbox[3]})", places_type, limit, timeout)
 
         queries = []
         for place in places_type:
@@ -262,51 +506,71 @@ class PlacesAPIClient:
                 tag_filter = f'["amenity"="{place}"]'  # Default to amenity if no key specified
             
             queries.append(f"""
-            node{tag_filter}({singapore_bbox[0]},{singapore_bbox[1]},{singapore_bbox[2]},{singapore_bbox[3]});
-            way{tag_filter}({singapore_bbox[0]},{singapore_bbox[1]},{singapore_bbox[2]},{singapore_bbox[3]});
-            relation{tag_filter}({singapore_bbox[0]},{singapore_bbox[1]},{singapore_bbox[2]},{singapore_bbox[3]});
+            node{tag_filter}({bbox[0]},{bbox[1]},{bbox[2]},{bbox[3]});
+            way{tag_filter}({bbox[0]},{bbox[1]},{bbox[2]},{bbox[3]});
+            relation{tag_filter}({bbox[0]},{bbox[1]},{bbox[2]},{bbox[3]});
             """)
         
         # Combine all queries with union
         query_parts = [
-            "[out:json][timeout:60];",  # Increased timeout for larger query
+            f"[out:json][timeout:{timeout}];",
             "(",
             *queries,
             ");",
-            f"out body {limit};",
+            # center gives ways/relations a lat/lon so they can be indexed
+            f"out body center {limit};" if limit else "out body center;",
             ">;",
             "out skel qt;"
         ]
         
-        return "\n".join(query_parts)    
+        return "\n".join(query_parts)
+
+    def _build_sg_query(self,places_type: List[str]= None,limit: Optional[int]= 50):
+        """Island-wide query, limit=None returns every match (used for snapshots)"""
+        if not places_type:
+            places_type=["amenity=restaurant", "amenity=cafe"]
+        # Increased timeout for larger query
+        return self._build_bbox_query(SINGAPORE_BBOX, places_type, limit, timeout=60)
 
 
-    def search_all_singapore(self, places_type: List[str] = None, limit: int = 50):
+    def search_all_singapore(self, places_type: List[str] = None, limit: Optional[int] = 50):
         """Search for places across all of Singapore"""
-        query = self._build_sg_query(places_type, limit)
-        
+        return self.search_bbox(SINGAPORE_BBOX, places_type, limit)
+
+    def search_bbox(self, bbox: Tuple[float, float, float, float], places_type: List[str] = None,
+                    limit: Optional[int] = 50):
+        """Search for places across a whole region, limit=None returns every match (used for snapshots)"""
+        query = self._build_bbox_query(bbox, places_type or ["amenity=restaurant", "amenity=cafe"], limit, timeout=60)
+        # region-wide queries have a 60s server timeout, give the client a bit more
+        places = self._run_query(query, timeout=max(self.timeout, 90))
+        return places[:limit] if limit else places
+
+
+
+    def fetch_changes(self, since: str, places_type: List[str] = None,
+                      bbox: Tuple[float, float, float, float] = SINGAPORE_BBOX) -> Optional[Dict]:
+        """What changed in bbox since the ISO 8601 timestamp, for incremental index updates.
+
+        Returns {'places': changed places, 'changed': ids of every changed element
+        (including ones _process_elements skips), 'current': ids of everything
+        matching now, 'osm_base': timestamp of the data} or None on error.
+        """
+        query = self._build_changes_query(bbox, places_type or ["amenity=restaurant", "amenity=cafe"], since)
         try:
-            response = requests.post(
-                self.overpass_endpoint,
-                data=query,
-                headers={'Content-Type': 'text/plain'}
-            )
-            response.raise_for_status()
-            data = response.json()
-            if 'elements' not in data:
-                print("No elements found in response")
-                return []
-            return self._process_elements(data['elements'])
+            data = self._post(query, timeout=max(self.timeout, 90))
         except Exception as e:
-            print(f'Error with Overpass API: {e}')
-            if hasattr(e, 'response') and e.response is not None:
-                try:
-                    print(f'Response: {e.response.text}')
-                except:
-                    print("Could not decode error response")
-            return []    
-
+            self._report_error(e)
+            return None
 
+        elements = data.get('elements', [])
+        # elements printed with tags are the changed ones, the rest is the id listing
+        changed = [element for element in elements if 'tags' in element]
+        return {
+            'places': self._process_elements(changed),
+            'changed': {f"{element['type']}_{element['id']}" for element in changed},
+            'current': {f"{element['type']}_{element['id']}" for element in elements},
+            'osm_base': data.get('osm3s', {}).get('timestamp_osm_base'),
+        }
 
     def _process_elements(self,elements: List[Dict]):
         places=[]
@@ -315,43 +579,17 @@ class PlacesAPIClient:
             if 'tags' not in element or 'name' not in element['tags']:
                 continue
 
-            place = {
-                'id': f"{element['type']}_{element['id']}",
-                'name': element['tags']['name'],
-                'type': self._get_place_type(element['tags']),
-                'tags': element['tags'],
-                'lat': element.get('lat'),
-                'lon': element.get('lon')
-            }
-                
-
-            if 'center' in element:
-                place.update({
-                    'lat': element['center'].get('lat'),
-                    'lon': element['center'].get('lon')
-                })
-
-            #add address
-            hmap={}
-            tags=element.get('tags','')
-            #add additional features here
-            for key in ['addr:street', 'addr:housename','addr:housenumber','addr:postcode', 'addr:city','name']:
-                if key in tags:
-                    hmap[key]=tags[key]
-            if hmap:
-                place['address']=hmap
-            places.append(place)
+            tags = element['tags']
+            # ways/relations only have a centre
+            coords = element.get('center') or element
+            # add additional features (address keys, place type) in place_table.make_place
+            places.append(make_place(f"{element['type']}_{element['id']}", tags, coords.get('lat'), coords.get('lon')))
 
         return places
     
     def _get_place_type(self,tags: Dict[str,str]):
         """determine the main features of place from tags, returns Dict[str,str]"""
-        core_features=['cuisine','amenity','name','website','indoor_seating','outdoor_seating','indoor_seating','wheelchair','takeaway']
-        features={}
-        for tag in core_features:
-            if tag in tags:
-                features[tag] = tags[tag]
-        return features
+        return place_type(tags)
         
 def test_places_api_client():
     print("\nTesting PlacesAPIClient...")
@@ -398,9 +636,47 @@ def test_places_api_client():
 
 
 class PlaceRecommender:
-    def __init__(self, model_name='all-mpnet-base-v2'):
-        self.model = SentenceTransformer(model_name)
-    
+    # places are encoded this many at a time when the caller may cancel (see get_recommendations)
+    PLACE_ENCODE_CHUNK = 64
+
+    def __init__(self, model_name='all-mpnet-base-v2', cache_dir: str = None,
+                 batch_queries: bool = False, max_batch_size: int = 32, max_wait_ms: float = 5.0,
+                 backend: str = 'torch', encoder_address: str = None,
+                 lexical_candidates: int = 300, lexical_weight: float = 0.2, lexical_min_hits: int = 20,
+                 distance_weight: float = 0.0, distance_decay_m: float = 1000):
+        if encoder_address:
+            # encodes run in a shared inference_server process, no weights in this one
+            self.model = RemoteEncoder(encoder_address)
+            model_name, backend = self.model.model_name, self.model.backend
+        else:
+            # backend: torch (fp32), int8 (dynamically quantised) or onnx, see encoders.BACKENDS
+            self.model = load_encoder(model_name, backend)
+        # embeddings from different models/backends must never be mixed (stores, shared index)
+        self.namespace = store_namespace(model_name, backend)
+        # Optionally funnel concurrent query encodes through one batched worker
+        self.query_encoder = BatchingEncoder(self.model, max_batch_size, max_wait_ms) if batch_queries else None
+        # Place embeddings are cached on disk per model so restarts don't re-encode
+        self.embedding_store = None
+        # BM25 prefilter for rank_all(): only the best lexical_candidates word matches are
+        # reranked, by (1 - weight) * cosine + weight * normalised BM25. With fewer than
+        # lexical_min_hits matches every place is ranked, purely dense.
+        self.lexical_candidates = lexical_candidates
+        self.lexical_weight = lexical_weight
+        self.lexical_min_hits = lexical_min_hits
+        # Where the caller passes distances, scores are blended with proximity:
+        # (1 - weight) * score + weight * exp(-distance / decay), see blend_distance()
+        self.distance_weight = distance_weight
+        self.distance_decay_m = distance_decay_m
+        if cache_dir:
+            self.use_store(cache_dir)
+
+    def use_store(self, cache_dir: str):
+        """Cache place embeddings on disk under cache_dir (per model namespace) from now on"""
+        self.embedding_store = EmbeddingStore(
+            os.path.join(cache_dir, self.namespace),
+            dim=self.model.get_sentence_embedding_dimension()
+        )
+
     def _create_place_description(self, place: Dict) -> str:
         """Create a descriptive text for each place from its data"""
         #feel free to add wtv u want
@@ -421,30 +697,170 @@ class PlaceRecommender:
         description = f"{name} {cuisine} {amenity} {address}".lower()
         return description
 
-    def get_recommendations(self, places: List[Dict], query: str = None, top_n: int = 3) -> List[Dict]:
+    def get_recommendations(self, places: List[Dict], query: str = None, top_n: int = 3,
+                            query_embedding: np.ndarray = None, cancel: threading.Event = None) -> List[Dict]:
+        """query_embedding skips the query encode (see aencode_query); once cancel is set,
+        encoding the places stops and [] is returned"""
 
         if query is None:
             # Return first N places with default score
             return [dict(place, similarity_score=1.0) for place in places[:top_n]]
-        
-       
-        query_embedding = self.model.encode(query, convert_to_tensor=True).unsqueeze(0)  
-        
-      
-        place_descriptions = [self._create_place_description(place) for place in places]
-        place_embeddings = self.model.encode(place_descriptions, convert_to_tensor=True) 
 
-        similarity_scores = cosine_similarity(query_embedding.cpu().numpy(), place_embeddings.cpu().numpy())[0] 
-       
-        top_indices = np.argsort(similarity_scores)[::-1][:top_n]
-    
-        results= [
-            dict(places[idx], similarity_score=float(similarity_scores[idx]))
-            for idx in top_indices
-        ]
+        if query_embedding is None:
+            with stage('query_encode'):
+                query_embedding = self._encode_query(query)
+
+        with stage('place_encode'):
+            place_embeddings = self._encode_places(places, cancel)
+        if place_embeddings is None:
+            return []
+        place_embeddings = normalize_rows(place_embeddings)
+        with stage('similarity'):
+            similarity_scores = place_embeddings @ normalize_rows(query_embedding)
+
+        top_indices, top_scores = top_k(similarity_scores, top_n)
         #adjust accordingly
-        return results
-    
+        return [
+            dict(places[idx], similarity_score=float(score))
+            for idx, score in zip(top_indices, top_scores)
+        ]
+
+    def blend_distance(self, scores: np.ndarray, distances: np.ndarray) -> np.ndarray:
+        """(1 - distance_weight) * scores + distance_weight * exp(-distances / distance_decay_m),
+        one vectorised pass; unknown (NaN) distances count as far away"""
+        if not self.distance_weight:
+            return scores
+        proximity = np.nan_to_num(np.exp(-np.asarray(distances, dtype=np.float32) / np.float32(self.distance_decay_m)))
+        return (1 - self.distance_weight) * np.asarray(scores, dtype=np.float32) + self.distance_weight * proximity
+
+    def build_index(self, places: List[Dict], dtype: str = 'float32') -> EmbeddingMatrix:
+        """Embed every place once into a contiguous matrix for rank_all()"""
+        return EmbeddingMatrix(self._encode_places(places), places, dtype=dtype)
+
+    def update_index(self, places: List[Dict], previous: EmbeddingMatrix, changed: Set[str]) -> EmbeddingMatrix:
+        """Like build_index, but copies rows from previous for places whose description didn't change.
+
+        Places not in changed are taken as-is; changed ones are only re-embedded
+        if their _create_place_description text differs from before.
+        """
+        ids = place_ids(places)
+        rows = [previous.row_of.get(place_id) for place_id in ids]
+        stale = [
+            i for i, (place_id, row) in enumerate(zip(ids, rows))
+            if row is None or (place_id in changed and
+                               self._create_place_description(places[i]) != self._create_place_description(previous.places[row]))
+        ]
+        reuse = np.array([i for i in range(len(ids)) if rows[i] is not None], dtype=np.int64)
+        vectors = np.empty((len(ids), previous.vectors.shape[1]), dtype=np.float32)
+        if len(reuse):
+            vectors[reuse] = previous.dense(np.array([rows[i] for i in reuse], dtype=np.int64))
+        if stale:
+            vectors[stale] = normalize_rows(self._encode_places([places[i] for i in stale]))
+        print(f'Re-embedded {len(stale)} of {len(ids)} places')
+
+        return EmbeddingMatrix(vectors, places, dtype=previous.dtype)
+
+    def lexical_for(self, matrix: EmbeddingMatrix) -> Optional[LexicalIndex]:
+        """BM25 index over matrix's places for rank_all(), None when the lexical prefilter is off"""
+        if self.lexical_candidates <= 0:
+            return None
+        return LexicalIndex(
+            [place_text(place, self._create_place_description(place)) for place in matrix.places],
+            matrix.places
+        )
+
+    def rank_all(self, query: str, rows: np.ndarray, matrix: EmbeddingMatrix,
+                 query_embedding: np.ndarray = None, lexical: LexicalIndex = None
+                 ) -> Tuple[np.ndarray, np.ndarray]:
+        """rows ranked against query, best first: (positions in rows, scores) to page through.
+
+        With a lexical index (matrix's lexical_for()) and at least lexical_min_hits word
+        matches among rows, only the best lexical_candidates matches are cosine-scored and
+        ranked by the blend of cosine and BM25; otherwise every row is ranked by cosine.
+        Proximity isn't in the scores, RankedList.page() blends it in per requester.
+        """
+        if query_embedding is None:
+            with stage('query_encode'):
+                query_embedding = self._encode_query(query)
+        rows = np.asarray(rows, dtype=np.int64)
+        if lexical is not None and len(rows):
+            position = np.full(len(matrix), -1, dtype=np.int64)
+            position[rows] = np.arange(len(rows))
+            with stage('lexical'):
+                hits, bm25 = lexical.search(query, self.lexical_candidates, position >= 0)
+            if len(hits) >= self.lexical_min_hits:
+                with stage('similarity'):
+                    scores = np.asarray(matrix.scores(query_embedding, hits), dtype=np.float32)
+                    scores = (1 - self.lexical_weight) * scores + self.lexical_weight * bm25 / bm25[0]
+                order = np.argsort(-scores, kind='stable')
+                return position[hits][order], scores[order]
+        with stage('similarity'):
+            scores = np.asarray(matrix.scores(query_embedding, rows), dtype=np.float32)
+        order = np.argsort(-scores, kind='stable')
+        return order, scores[order]
+
+    def preview(self, query: str, top_n: int, mask: np.ndarray, matrix: EmbeddingMatrix,
+                lexical: Optional[LexicalIndex]) -> List[Dict]:
+        """Best BM25 word matches only, no model call: a first answer to show while rank_all() runs.
+        [] without a lexical index or without any matches"""
+        if lexical is None:
+            return []
+        with stage('preview'):
+            rows, bm25 = lexical.search(query, top_n, mask)
+        return [
+            dict(matrix.places[row], similarity_score=float(score / bm25[0]))
+            for row, score in zip(rows, bm25)
+        ]
+
+    async def aencode_query(self, query: str) -> np.ndarray:
+        """_encode_query for async callers. With batching, a caller cancelled while its
+        query is still queued is dropped from the batch instead of encoded"""
+        with stage('query_encode'):
+            if self.query_encoder is not None:
+                return await self.query_encoder.aencode(query)
+            return await asyncio.to_thread(self._encode_query, query)
+
+    def encode_queries(self, queries: List[str]) -> np.ndarray:
+        """Encode many queries in one batched call (duplicates only once), rows are L2-normalised"""
+        unique = list(dict.fromkeys(queries))
+        vectors = normalize_rows(self.model.encode(unique, convert_to_numpy=True, batch_size=64))
+        row_of = {query: i for i, query in enumerate(unique)}
+        return vectors[[row_of[query] for query in queries]]
+
+    def _encode_query(self, query: str) -> np.ndarray:
+        if self.query_encoder is not None:
+            return self.query_encoder.encode(query)
+        return self.model.encode([query], convert_to_numpy=True)[0]
+
+    def _encode_texts(self, texts: List[str], cancel: threading.Event = None) -> Optional[np.ndarray]:
+        """model.encode, in PLACE_ENCODE_CHUNK pieces if cancel is given (None once it's set)"""
+        if cancel is None or not texts:
+            return self.model.encode(texts, convert_to_numpy=True)
+        chunks = []
+        for start in range(0, len(texts), self.PLACE_ENCODE_CHUNK):
+            if cancel.is_set():
+                return None
+            chunks.append(self.model.encode(texts[start:start + self.PLACE_ENCODE_CHUNK], convert_to_numpy=True))
+        return np.vstack(chunks)
+
+    def _encode_places(self, places: List[Dict], cancel: threading.Event = None) -> Optional[np.ndarray]:
+        """Embed place descriptions, only running the model on ones not cached yet (None if cancelled)"""
+        place_descriptions = [self._create_place_description(place) for place in places]
+        if self.embedding_store is None:
+            return self._encode_texts(place_descriptions, cancel)
+
+        keys = [make_key(place.get('id'), desc) for place, desc in zip(places, place_descriptions)]
+        cached = self.embedding_store.get_many(keys)
+        missing = [i for i, vec in enumerate(cached) if vec is None]
+        if missing:
+            encoded = self._encode_texts([place_descriptions[i] for i in missing], cancel)
+            if encoded is None:
+                return None
+            self.embedding_store.put_many([keys[i] for i in missing], encoded)
+            for i, vec in zip(missing, encoded):
+                cached[i] = vec
+        return np.vstack(cached)
+
     def _clean_recommendations(self, results: List[Dict]):
         """Preprocess results into readable format"""
         res = []
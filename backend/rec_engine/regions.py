@@ -0,0 +1,162 @@
+"""Regions served from local data: one shard (place index + embedding matrix +
+lexical index) per configured bbox, loaded on first use and evicted when idle.
+
+    REC_REGIONS="sg=1.1496,103.5940,1.4784,104.0945,sg,Singapore;kl=2.9,101.45,3.3,101.85,my,Malaysia"
+
+The optional country code and name after the bbox label offline reverse geocoding
+in that region; without them its addresses come from Nominatim.
+
+Requests are routed to the smallest region containing their coordinates, so
+each query only touches one shard however many regions are configured.
+"""
+import time
+import threading
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .embedding_matrix import EmbeddingMatrix
+from .geocode_cache import OfflineReverseGeocoder, offline_geocoder
+from .lexical_index import LexicalIndex
+from .place_index import PlaceIndex
+from .recommendation_engine import SINGAPORE_BBOX
+
+DEFAULT_REGIONS = 'sg=' + ','.join(str(value) for value in SINGAPORE_BBOX) + ',sg,Singapore'
+
+
+@dataclass(frozen=True)
+class Region:
+    name: str
+    bbox: Tuple[float, float, float, float]  # (min_lat, min_lon, max_lat, max_lon)
+    country_code: Optional[str] = None
+    country: Optional[str] = None
+
+    def contains(self, lat: float, lon: float) -> bool:
+        min_lat, min_lon, max_lat, max_lon = self.bbox
+        return min_lat <= lat <= max_lat and min_lon <= lon <= max_lon
+
+    @property
+    def area(self) -> float:
+        min_lat, min_lon, max_lat, max_lon = self.bbox
+        return (max_lat - min_lat) * (max_lon - min_lon)
+
+
+def parse_regions(spec: str) -> List[Region]:
+    """'name=min_lat,min_lon,max_lat,max_lon[,country_code,country];...' -> regions, raises ValueError if malformed"""
+    regions = []
+    for part in filter(None, (part.strip() for part in spec.split(';'))):
+        name, _, rest = part.partition('=')
+        fields = [value.strip() for value in rest.split(',')]
+        try:
+            values = tuple(float(value) for value in fields[:4])
+        except ValueError:
+            values = ()
+        country = fields[4:]
+        if not name.strip() or len(values) != 4 or values[0] >= values[2] or values[1] >= values[3] \
+                or len(country) not in (0, 2) or not all(country):
+            raise ValueError(f'Bad region {part!r}, expected name=min_lat,min_lon,max_lat,max_lon[,country_code,country]')
+        regions.append(Region(name.strip(), values, *country))
+    if len({region.name for region in regions}) != len(regions):
+        raise ValueError(f'Duplicate region names in {spec!r}')
+    return regions
+
+
+@dataclass
+class Shard:
+    region: Region
+    index: PlaceIndex
+    matrix: EmbeddingMatrix
+    lexical: Optional[LexicalIndex] = None
+    version: Optional[str] = None  # shared_index version it was mapped from
+    last_used: float = field(default_factory=time.monotonic)
+    _reverse: Optional[OfflineReverseGeocoder] = None
+
+    @property
+    def nbytes(self) -> int:
+        """Vectors, place columns and postings, what the memory budget is counted in"""
+        return self.matrix.nbytes + self.index.places.nbytes + (self.lexical.nbytes if self.lexical else 0)
+
+    @property
+    def reverse_geocoder(self) -> Optional[OfflineReverseGeocoder]:
+        if self._reverse is None:
+            self._reverse = offline_geocoder(self.index, self.region.country, self.region.country_code)
+        return self._reverse
+
+
+class RegionRegistry:
+    """Loaded shards by region name, least recently used ones dropped over memory_budget bytes.
+
+    loader(region) maps a region's shard (None if it has none yet). A dropped
+    shard stays valid for requests still holding it and is loaded again on the
+    next request there.
+    """
+
+    def __init__(self, regions: List[Region], loader: Callable[[Region], Optional[Shard]],
+                 memory_budget: int = 0):
+        # smallest first, so a city configured inside a country's bbox wins
+        self.regions = sorted(regions, key=lambda region: region.area)
+        self.loader = loader
+        self.memory_budget = memory_budget  # 0 = no limit
+        self._shards: Dict[str, Shard] = {}
+        self._lock = threading.Lock()
+        self._load_locks = {region.name: threading.Lock() for region in regions}
+        self.loads = 0
+        self.evictions = 0
+
+    def region_at(self, lat: float, lon: float) -> Optional[Region]:
+        for region in self.regions:
+            if region.contains(lat, lon):
+                return region
+        return None
+
+    def shards(self) -> List[Shard]:
+        with self._lock:
+            return list(self._shards.values())
+
+    def nbytes(self) -> int:
+        return sum(shard.nbytes for shard in self.shards())
+
+    def get(self, region: Region, load: bool = True) -> Optional[Shard]:
+        """The region's shard, mapping it first if it isn't loaded (and load is True)"""
+        shard = self._touch(region.name)
+        if shard is not None or not load:
+            return shard
+        # one loader per region, concurrent first requests wait for it instead of loading again
+        with self._load_locks[region.name]:
+            shard = self._touch(region.name)
+            if shard is None:
+                shard = self.loader(region)
+                if shard is not None:
+                    self.loads += 1
+                    self.put(shard)
+        return shard
+
+    def _touch(self, name: str) -> Optional[Shard]:
+        with self._lock:
+            shard = self._shards.get(name)
+            if shard is not None:
+                shard.last_used = time.monotonic()
+            return shard
+
+    def put(self, shard: Shard):
+        """Add or replace a region's shard, then evict idle ones over the budget"""
+        with self._lock:
+            self._shards[shard.region.name] = shard
+            if self.memory_budget <= 0:
+                return
+            total = sum(loaded.nbytes for loaded in self._shards.values())
+            for idle in sorted(self._shards.values(), key=lambda loaded: loaded.last_used):
+                if total <= self.memory_budget:
+                    break
+                if idle is shard:
+                    continue
+                del self._shards[idle.region.name]
+                total -= idle.nbytes
+                self.evictions += 1
+                print(f'Evicted region {idle.region.name} ({idle.nbytes / 1e6:.0f} MB) to stay under the memory budget')
+
+    def reverse(self, lat: float, lon: float) -> Optional[Dict]:
+        """Offline reverse geocoding from the loaded shard at (lat, lon), for Geocoder.offline"""
+        region = self.region_at(lat, lon)
+        shard = self.get(region, load=False) if region is not None else None
+        geocoder = shard.reverse_geocoder if shard is not None else None
+        return geocoder.reverse(lat, lon) if geocoder is not None else None
@@ -0,0 +1,95 @@
+import time
+import threading
+from collections import OrderedDict
+from typing import Dict, Hashable, Iterable, Optional, Tuple
+
+# ~111 km per degree of latitude; Singapore is close enough to the equator
+# that the same step works for longitude
+METERS_PER_DEGREE = 111_320
+
+
+def normalize_query(query: str) -> str:
+    """'  Chicken   Rice ' -> 'chicken rice'"""
+    return " ".join((query or "").lower().split())
+
+
+def snap(lat: float, lon: float, grid_m: float) -> Tuple[int, int]:
+    """Grid cell (row, col) of a coordinate, cells are about grid_m metres across"""
+    step = grid_m / METERS_PER_DEGREE
+    return round(lat / step), round(lon / step)
+
+
+class ResultCache:
+    """Size-bounded LRU cache of /api/recommend responses with a TTL.
+
+    Keys are built with make_key, so requests a few metres apart with the same
+    (normalised) query, filters, top_n and radius share an entry. invalidate() drops
+    everything when the place index changes; a response computed against the
+    old index is refused by put() because its generation is out of date.
+    """
+
+    def __init__(self, max_entries: int = 2000, ttl: float = 600, grid_m: float = 100):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.grid_m = grid_m
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[Hashable, Tuple[float, Dict]]' = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def make_key(self, lat: float, lon: float, query: str, price_min: int, price_max: int,
+                 rating_min: float, rating_max: float, bookable: bool, amenities: Iterable[str],
+                 top_n: int, radius: float = None) -> Hashable:
+        return (snap(lat, lon, self.grid_m), normalize_query(query), price_min, price_max,
+                rating_min, rating_max, bool(bookable), tuple(sorted(set(amenities))), top_n, radius)
+
+    def get(self, key: Hashable) -> Optional[Dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.time() - entry[0] > self.ttl:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Hashable, response: Dict, generation: int = None):
+        """Store a response, unless it was computed before the last invalidate()"""
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._entries[key] = (time.time(), response)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+            self.generation += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_s": self.ttl,
+                "grid_m": self.grid_m,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "generation": self.generation,
+            }
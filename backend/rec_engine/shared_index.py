@@ -0,0 +1,110 @@
+"""Place index + embedding matrix as plain .npy files that every uvicorn worker maps read-only.
+
+One process (the one holding the index lock in main) writes a new version
+directory and then atomically points CURRENT at it; the others notice the
+change and np.load the columns with mmap_mode='r', so the OS keeps a single
+copy of the vectors and coordinates in the page cache for all of them.
+
+    shared_index/
+      CURRENT              name of the live version
+      v<time_ns>-<pid>/    meta.json + one .npy per column
+"""
+import os
+import json
+import time
+import shutil
+from typing import Optional, Tuple
+
+import numpy as np
+
+from .place_index import PlaceIndex
+from .place_table import PlaceTable, CODED_TAGS
+from .embedding_matrix import EmbeddingMatrix
+
+CURRENT_FILE = 'CURRENT'
+COLUMNS = ('osm_type', 'osm_id', 'lat', 'lon', 'flags', 'price_level', 'rating')
+# versions kept on disk, a worker may still be opening the previous one
+KEEP_VERSIONS = 2
+
+
+def current_version(root: str) -> Optional[str]:
+    try:
+        with open(os.path.join(root, CURRENT_FILE), 'r', encoding='utf-8') as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def publish(root: str, index: PlaceIndex, matrix: EmbeddingMatrix, namespace: str) -> str:
+    """Write index and matrix as a new version and make it current, returns the version name"""
+    table = index.places
+    version = f"v{time.time_ns()}-{os.getpid()}"
+    path = os.path.join(root, version)
+    os.makedirs(path)
+
+    for name in COLUMNS:
+        np.save(os.path.join(path, f'{name}.npy'), getattr(table, name))
+    np.save(os.path.join(path, 'codes.npy'), np.stack([table.codes[key] for key in CODED_TAGS], axis=1))
+    np.save(os.path.join(path, 'vectors.npy'), matrix.vectors)
+    with open(os.path.join(path, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump({
+            'namespace': namespace,
+            'scale': matrix.scale,
+            'coded_tags': list(CODED_TAGS),
+            'strings': table.strings,
+            'extra': {str(row): tags for row, tags in table.extra.items()},
+            'bbox': index.bbox,
+            'built_at': index.built_at,
+            'synced_at': index.synced_at,
+            'osm_base': index.osm_base,
+            'cell_deg': index.cell_deg,
+        }, f)
+
+    tmp_path = os.path.join(root, f'{CURRENT_FILE}.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(version)
+    os.replace(tmp_path, os.path.join(root, CURRENT_FILE))
+    _prune(root, version)
+    return version
+
+
+def _prune(root: str, current: str):
+    versions = sorted((name for name in os.listdir(root) if name.startswith('v')),
+                      key=lambda name: os.path.getmtime(os.path.join(root, name)))
+    for name in versions[:-KEEP_VERSIONS]:
+        if name != current:
+            shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+
+
+def load(root: str, namespace: str, version: str = None) -> Optional[Tuple[PlaceIndex, EmbeddingMatrix, str]]:
+    """Map the current (or given) version read-only, returns (index, matrix, version).
+
+    None if there is no usable version, or it was embedded with another model/backend.
+    """
+    version = version or current_version(root)
+    if version is None:
+        return None
+    path = os.path.join(root, version)
+    try:
+        with open(os.path.join(path, 'meta.json'), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta['namespace'] != namespace:
+            print(f"❌ Shared index {version} was built with {meta['namespace']}, not {namespace}")
+            return None
+        columns = {name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r') for name in COLUMNS}
+        codes = np.load(os.path.join(path, 'codes.npy'), mmap_mode='r')
+        vectors = np.load(os.path.join(path, 'vectors.npy'), mmap_mode='r')
+    except (OSError, ValueError, KeyError) as e:
+        print(f'❌ Could not load shared index {version}: {e}')
+        return None
+
+    table = PlaceTable(
+        columns['osm_type'], columns['osm_id'], columns['lat'], columns['lon'],
+        {key: codes[:, i] for i, key in enumerate(meta['coded_tags'])},
+        columns['flags'], columns['price_level'], columns['rating'],
+        {int(row): tags for row, tags in meta['extra'].items()}, meta['strings']
+    )
+    bbox = tuple(meta['bbox']) if meta.get('bbox') else None
+    index = PlaceIndex(table, bbox=bbox, built_at=meta['built_at'], cell_deg=meta['cell_deg'],
+                       synced_at=meta['synced_at'], osm_base=meta['osm_base'])
+    return index, EmbeddingMatrix.from_stored(vectors, table, meta['scale']), version
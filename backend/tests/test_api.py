@@ -0,0 +1,51 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from rec_engine.ranked_lists import encode_cursor
+
+client = TestClient(main.app)  # no startup: nothing here gets as far as the model
+PARAMS = {'lat': 1.3048, 'lon': 103.8318, 'query': 'ramen'}
+
+
+@pytest.mark.parametrize('top_n', [-1, 0, main.MAX_TOP_N + 1, 100000])
+def test_top_n_out_of_range_is_rejected(top_n):
+    assert client.get('/api/recommend', params=dict(PARAMS, top_n=top_n)).status_code == 422
+    assert client.get('/api/recommend/stream', params=dict(PARAMS, top_n=top_n)).status_code == 422
+    assert client.post('/api/recommend/batch', json=[dict(PARAMS, top_n=top_n)]).status_code == 422
+
+
+def test_cursor_with_bad_top_n_is_rejected(monkeypatch):
+    monkeypatch.setattr(main, 'model_ready', type('Ready', (), {'is_set': lambda self: True})())
+    state = {'lat': 1.3048, 'lon': 103.8318, 'query': 'ramen', 'filters': {}, 'top_n': -1,
+             'radius': 3000.0, 'offset': 3}
+
+    assert client.get('/api/recommend', params={'cursor': encode_cursor(state)}).status_code == 400
+
+
+def test_batch_leaves_the_interactive_caches_alone(monkeypatch):
+    from rec_engine.place_table import PlaceTable
+    from rec_engine.ranked_lists import RankedList
+    from rec_engine.recommendation_engine import PlaceRecommender
+
+    recommender = PlaceRecommender.__new__(PlaceRecommender)
+    recommender.distance_weight = 0
+    recommender.encode_queries = lambda queries: [None] * len(queries)
+    places = [{'id': 'node_1', 'name': 'Ramen Bar', 'lat': 1.3048, 'lon': 103.8318, 'tags': {}}]
+    ranked = []
+
+    async def rank_candidates(*args, **kwargs):
+        ranked.append(args)
+        yield 'ranked', RankedList(PlaceTable.from_places(places), [0.5])
+
+    monkeypatch.setattr(main, 'model_ready', type('Ready', (), {'is_set': lambda self: True})())
+    monkeypatch.setattr(main, 'recommender', recommender)
+    monkeypatch.setattr(main, '_rank_candidates', rank_candidates)
+    main.result_cache.invalidate()
+    main.ranked_lists.invalidate()
+
+    lines = client.post('/api/recommend/batch', json=[PARAMS, PARAMS]).text.splitlines()
+
+    assert len(lines) == 2 and '"Ramen Bar"' in lines[0]
+    assert len(ranked) == 1  # the same search is ranked once per batch
+    assert len(main.ranked_lists) == 0 and main.result_cache.stats()['entries'] == 0
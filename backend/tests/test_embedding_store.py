@@ -0,0 +1,19 @@
+import numpy as np
+
+from rec_engine.embedding_store import EmbeddingStore
+
+
+def test_partial_key_line_is_dropped(tmp_path):
+    store = EmbeddingStore(str(tmp_path), dim=4)
+    store.put_many(['a', 'b'], np.eye(4, dtype=np.float32)[:2])
+    # crash halfway through appending the next key
+    with open(tmp_path / EmbeddingStore.KEYS_FILE, 'a') as f:
+        f.write('c-half')
+
+    reopened = EmbeddingStore(str(tmp_path), dim=4)
+    reopened.put_many(['d'], np.eye(4, dtype=np.float32)[3:])
+
+    again = EmbeddingStore(str(tmp_path), dim=4)
+    assert len(again) == 3 and 'c-half' not in again
+    assert again.get('b').tolist() == [0, 1, 0, 0]
+    assert again.get('d').tolist() == [0, 0, 0, 1]
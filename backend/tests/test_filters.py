@@ -0,0 +1,17 @@
+from rec_engine.filters import price_level_of
+from rec_engine.place_table import PlaceTable
+
+
+def test_price_level_out_of_range_is_unknown():
+    assert price_level_of({'tags': {'price_level': '$$'}}) == 2
+    assert price_level_of({'tags': {'price_level': '3'}}) == 3
+    assert price_level_of({'tags': {'price_level': '1000'}}) == -1
+    assert price_level_of({'tags': {'price_level': '0'}}) == -1
+    assert price_level_of({'tags': {'price_level': 'cheap'}}) == -1
+
+
+def test_table_with_bad_price_level():
+    places = [{'id': 'node_1', 'name': 'A', 'lat': 1.3, 'lon': 103.8, 'tags': {'price_level': '1000'}},
+              {'id': 'node_2', 'name': 'B', 'lat': 1.3, 'lon': 103.8, 'tags': {'price_level': '$$$'}}]
+
+    assert PlaceTable.from_places(places).price_level.tolist() == [-1, 3]
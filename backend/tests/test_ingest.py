@@ -0,0 +1,82 @@
+import os
+
+from rec_engine.ingest import apply_changes, update_region
+from rec_engine.place_index import PlaceIndex
+from rec_engine.recommendation_engine import PlacesAPIClient, raise_for_remark
+
+BBOX = (1.2, 103.8, 1.4, 104.0)
+
+
+def make_index(n: int = 100) -> PlaceIndex:
+    places = [
+        {'id': f'node_{i}', 'name': f'Place {i}', 'lat': 1.3 + i * 1e-4, 'lon': 103.9,
+         'tags': {'name': f'Place {i}', 'amenity': 'restaurant'}}
+        for i in range(n)
+    ]
+    return PlaceIndex(places, bbox=BBOX, osm_base='2026-01-01T00:00:00Z')
+
+
+class ReplyClient(PlacesAPIClient):
+    """PlacesAPIClient whose Overpass answers with a fixed JSON body (the next of several, if given a list)"""
+
+    def __init__(self, reply):
+        super().__init__()
+        self.replies = reply if isinstance(reply, list) else [reply]
+        self.queries = []
+
+    def _post(self, query, timeout=None):
+        self.queries.append(query)
+        return raise_for_remark(self.replies.pop(0) if len(self.replies) > 1 else self.replies[0])
+
+
+def test_remark_reply_keeps_index(tmp_path):
+    index = make_index()
+    path = os.path.join(tmp_path, 'places.json')
+    client = ReplyClient({'remark': 'runtime error: Query timed out in "query" at line 3 after 90 seconds.',
+                          'elements': [], 'osm3s': {'timestamp_osm_base': '2026-02-01T00:00:00Z'}})
+
+    assert client.fetch_changes(index.osm_base, bbox=BBOX) is None
+    assert update_region(index, path, client) is None
+    assert not os.path.exists(path)
+    assert len(index) == 100 and index.osm_base == '2026-01-01T00:00:00Z'
+
+
+def test_partial_reply_is_refused():
+    index = make_index()
+    # an id listing that lost most of the island, no remark
+    changes = {'places': [], 'changed': set(), 'current': {f'node_{i}' for i in range(30)},
+               'osm_base': '2026-02-01T00:00:00Z'}
+
+    assert apply_changes(index, changes) is None
+
+
+def test_refused_diff_falls_back_to_a_snapshot(tmp_path):
+    index = make_index()
+    path = os.path.join(tmp_path, 'places.json')
+    snapshot = [{'type': 'node', 'id': i, 'lat': 1.3, 'lon': 103.9, 'tags': {'name': f'Place {i}', 'amenity': 'cafe'}}
+                for i in range(90)]
+    client = ReplyClient([
+        # the diff lost most of the island
+        {'elements': [{'type': 'node', 'id': i} for i in range(30)], 'osm3s': {'timestamp_osm_base': '2026-02-01T00:00:00Z'}},
+        {'elements': snapshot},
+    ])
+
+    rebuilt, changed = update_region(index, path, client)
+
+    assert len(client.queries) == 2 and 'newer:' not in client.queries[1]
+    assert len(rebuilt) == 90 and changed == {f'node_{i}' for i in range(90)}
+    assert len(PlaceIndex.load(path)) == 90
+
+
+def test_small_diff_is_applied():
+    index = make_index()
+    changes = {'places': [{'id': 'node_5', 'name': 'Renamed', 'lat': 1.3, 'lon': 103.9,
+                           'tags': {'name': 'Renamed', 'amenity': 'cafe'}}],
+               'changed': {'node_5'}, 'current': {f'node_{i}' for i in range(95)},
+               'osm_base': '2026-02-01T00:00:00Z'}
+
+    updated = apply_changes(index, changes)
+
+    assert len(updated) == 95
+    assert updated.osm_base == '2026-02-01T00:00:00Z'
+    assert 'Renamed' in [place['name'] for place in updated.places]
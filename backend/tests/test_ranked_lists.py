@@ -0,0 +1,73 @@
+import numpy as np
+
+from rec_engine.embedding_matrix import EmbeddingMatrix
+from rec_engine.lexical_index import LexicalIndex
+from rec_engine.place_table import PlaceTable
+from rec_engine.ranked_lists import RankedList
+from rec_engine.recommendation_engine import PlaceRecommender
+
+# one place every ~111 m north of the origin, best match first
+PLACES = [{'id': f'node_{i}', 'name': f'Place {i}', 'lat': 1.3 + i * 1e-3, 'lon': 103.8, 'tags': {}}
+          for i in range(5)]
+
+
+def make_list() -> RankedList:
+    return RankedList(PlaceTable.from_places(PLACES), np.array([0.9, 0.8, 0.7, 0.6, 0.5]))
+
+
+def test_distances_and_cutoff_are_per_request():
+    ranked = make_list()
+
+    near_first, _ = ranked.page({}, 0, 5, 1.3, 103.8, radius=250)
+    near_last, _ = ranked.page({}, 0, 5, 1.304, 103.8, radius=250)
+
+    assert [p['name'] for p in near_first] == ['Place 0', 'Place 1', 'Place 2']
+    assert [p['name'] for p in near_last] == ['Place 2', 'Place 3', 'Place 4']
+    assert round(near_last[-1]['distance_m']) == 0
+
+
+def test_blend_reorders_the_whole_list():
+    ranked = make_list()
+
+    def nearest_wins(scores, distances):
+        return -distances
+
+    page, next_offset = ranked.page({}, 0, 3, 1.304, 103.8, blend=nearest_wins)
+
+    assert [p['name'] for p in page] == ['Place 4', 'Place 3', 'Place 2']
+    assert next_offset == 3
+
+
+def make_recommender(min_hits: int) -> PlaceRecommender:
+    # rank_all() only needs the lexical settings when it's given the query embedding
+    recommender = PlaceRecommender.__new__(PlaceRecommender)
+    recommender.lexical_candidates, recommender.lexical_weight, recommender.lexical_min_hits = 300, 0.5, min_hits
+    return recommender
+
+
+def test_lexical_prefilter_then_blend():
+    names = ['Ramen Bar', 'Noodle House', 'Ramen Ramen', 'Curry Corner', 'Ramen Stop']
+    places = [dict(place, name=name) for place, name in zip(PLACES, names)]
+    # cosine to the query: the non-matches are the closest
+    vectors = np.array([[0.2, 1], [1, 0], [0.6, 1], [1, 0.1], [0.4, 1]], dtype=np.float32)
+    matrix = EmbeddingMatrix(vectors, places)
+    lexical = LexicalIndex(names, places)
+    query = np.array([1, 0], dtype=np.float32)
+
+    order, scores = make_recommender(min_hits=2).rank_all('ramen', np.arange(5), matrix, query, lexical)
+    # only the word matches, by blended cosine + BM25
+    assert [names[i] for i in order] == ['Ramen Ramen', 'Ramen Stop', 'Ramen Bar']
+    assert np.all(np.diff(scores) <= 0)
+
+    order, _ = make_recommender(min_hits=4).rank_all('ramen', np.arange(5), matrix, query, lexical)
+    # too few matches: every place, by cosine alone
+    assert [names[i] for i in order] == ['Noodle House', 'Curry Corner', 'Ramen Ramen', 'Ramen Stop', 'Ramen Bar']
+
+
+def test_page_keeps_the_match_and_the_blended_score_apart():
+    ranked = make_list()
+
+    page, _ = ranked.page({}, 0, 1, 1.3, 103.8, blend=lambda scores, distances: scores / 2)
+
+    assert page[0]['similarity_score'] == np.float32(0.9)
+    assert page[0]['score'] == np.float32(0.45)
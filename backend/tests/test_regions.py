@@ -0,0 +1,40 @@
+import pytest
+
+from rec_engine.place_index import PlaceIndex
+from rec_engine.regions import RegionRegistry, Shard, parse_regions
+
+SPEC = 'sg=1.2,103.6,1.5,104.1,sg,Singapore;kl=2.9,101.45,3.3,101.85'
+
+
+def make_index(lat: float, lon: float, bbox) -> PlaceIndex:
+    places = [{'id': 'node_1', 'name': 'Corner Cafe', 'lat': lat, 'lon': lon,
+               'tags': {'name': 'Corner Cafe', 'amenity': 'cafe', 'addr:street': 'Jalan Ampang',
+                        'addr:housenumber': '12'}}]
+    return PlaceIndex(places, bbox=bbox)
+
+
+def registry() -> RegionRegistry:
+    points = {'sg': (1.3, 103.8), 'kl': (3.15, 101.7)}
+    regions = RegionRegistry(parse_regions(SPEC),
+                             lambda region: Shard(region, make_index(*points[region.name], region.bbox), None))
+    for region in regions.regions:
+        regions.get(region)
+    return regions
+
+
+def test_parse_country():
+    sg, kl = parse_regions(SPEC)
+    assert (sg.country_code, sg.country) == ('sg', 'Singapore')
+    assert (kl.country_code, kl.country) == (None, None)
+    with pytest.raises(ValueError):
+        parse_regions('kl=2.9,101.45,3.3,101.85,my')
+
+
+def test_reverse_uses_the_region_country():
+    address = registry().reverse(1.3, 103.8)['address']
+    assert (address['country'], address['country_code']) == ('Singapore', 'sg')
+    assert 'city' not in address  # no addr:city, and no guessing one
+
+
+def test_region_without_country_falls_back_to_nominatim():
+    assert registry().reverse(3.15, 101.7) is None
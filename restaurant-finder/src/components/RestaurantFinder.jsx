@@ -60,7 +60,7 @@ export default function RestaurantFinder({ userLocation }) {
 	const [bookable, setBookable] = useState(false);
 	const [showFilters, setShowFilters] = useState(false); // Controls filter panel for both mobile and desktop
 	const [filtersCollapsed, setFiltersCollapsed] = useState(false); // For desktop collapse
-	const { results, loading, error } = useRecommendations(
+	const { results, loading, error, hasMore, loadMore } = useRecommendations(
 		userLocation,
 		searchTerm,
 		priceRange,
@@ -351,6 +351,11 @@ export default function RestaurantFinder({ userLocation }) {
 						</CardFooter>
 					</Card>
 					))}
+						{!loading && hasMore && (
+							<div className="col-span-full flex justify-center">
+								<Button variant="outline" onClick={loadMore}>Show more</Button>
+							</div>
+						)}
              </div>   
            )}       
            </div>   
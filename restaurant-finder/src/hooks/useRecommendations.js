@@ -1,57 +1,130 @@
-import { useState, useEffect } from "react";
+import { useState, useEffect, useCallback, useRef } from "react";
 
 /**
  * Custom hook to fetch restaurant recommendations from the backend API.
+ * Results are streamed: a quick preview shows up first and is replaced by the
+ * semantically ranked results once they're ready. A new search aborts the
+ * previous request, so the backend stops working on it. loadMore() appends the
+ * next page, sliced by the backend from the already ranked list; a new search
+ * also aborts a page still loading, so it can't land in the new results.
  * @param {Object} userLocation - The user's location { lat, lng }.
  * @param {string} searchTerm - The user's search query.
  * @param {Array} priceRange - [min, max] price range.
  * @param {Array} ratingRange - [min, max] rating range.
  * @param {boolean} bookable - Whether to filter for bookable places.
- * @returns {Object} { results, loading, error }
+ * @returns {Object} { results, loading, refining, error, hasMore, loadMore }
  */
 export default function useRecommendations(userLocation, searchTerm, priceRange, ratingRange, bookable) {
   // State to store the fetched recommendations
   const [results, setResults] = useState([]);
-  // State to indicate loading status
+  // State to indicate loading status (nothing to show yet)
   const [loading, setLoading] = useState(false);
+  // State to indicate preview results are shown and ranked ones are on the way
+  const [refining, setRefining] = useState(false);
   // State to store any error message
   const [error, setError] = useState(null);
+  // Cursor of the next page, null when there are no more results
+  const [nextCursor, setNextCursor] = useState(null);
+  // State to indicate a next page is being fetched
+  const [loadingMore, setLoadingMore] = useState(false);
+  // AbortController of the next page request in flight, if any
+  const loadMoreController = useRef(null);
 
   useEffect(() => {
+    // Whatever page was loading belongs to the previous search
+    if (loadMoreController.current) loadMoreController.current.abort();
+    loadMoreController.current = null;
+    setLoadingMore(false);
+
     // Only fetch if location is available
-    if (userLocation && userLocation.lat && userLocation.lng) {
-      setLoading(true);
-      setError(null);
-
-      // Build query params
-      const params = new URLSearchParams({
-        lat: userLocation.lat,
-        lon: userLocation.lng,
-        query: searchTerm || "",
-        price_min: priceRange ? priceRange[0] : 1,
-        price_max: priceRange ? priceRange[1] : 5,
-        rating_min: ratingRange ? ratingRange[0] : 1,
-        rating_max: ratingRange ? ratingRange[1] : 6,
-        bookable: bookable ? "true" : "false"
+    if (!(userLocation && userLocation.lat && userLocation.lng)) return;
+
+    const controller = new AbortController();
+    setLoading(true);
+    setRefining(false);
+    setError(null);
+    setNextCursor(null);
+
+    // Build query params
+    const params = new URLSearchParams({
+      lat: userLocation.lat,
+      lon: userLocation.lng,
+      query: searchTerm || "",
+      price_min: priceRange ? priceRange[0] : 1,
+      price_max: priceRange ? priceRange[1] : 5,
+      rating_min: ratingRange ? ratingRange[0] : 1,
+      rating_max: ratingRange ? ratingRange[1] : 6,
+      bookable: bookable ? "true" : "false"
+    });
+
+    // Each NDJSON line is { stage, final, results, next_cursor }
+    const handleLine = (line) => {
+      if (!line.trim()) return;
+      const data = JSON.parse(line);
+      setResults(data.results || []);
+      setNextCursor(data.next_cursor || null);
+      setLoading(false);
+      setRefining(!data.final);
+    };
+
+    // Fetch recommendations from backend, reading lines as they arrive
+    fetch(`http://localhost:8000/api/recommend/stream?${params.toString()}`, { signal: controller.signal })
+      .then(async (res) => {
+        if (!res.ok) throw new Error("Failed to fetch recommendations");
+        const reader = res.body.getReader();
+        const decoder = new TextDecoder();
+        let buffered = "";
+        while (true) {
+          const { done, value } = await reader.read();
+          if (done) break;
+          buffered += decoder.decode(value, { stream: true });
+          const lines = buffered.split("\n");
+          buffered = lines.pop();
+          lines.forEach(handleLine);
+        }
+        handleLine(buffered);
+        setLoading(false);
+        setRefining(false);
+      })
+      .catch((err) => {
+        // Aborted because a newer search replaced this one
+        if (err.name === "AbortError") return;
+        setError(err.message);
+        setLoading(false);
+        setRefining(false);
       });
 
-      // Fetch recommendations from backend
-      fetch(`http://localhost:8000/api/recommend?${params.toString()}`)
-        .then((res) => {
-          if (!res.ok) throw new Error("Failed to fetch recommendations");
-          return res.json();
-        })
-        .then((data) => {
-          setResults(data.results || []);
-          setLoading(false);
-        })
-        .catch((err) => {
-          setError(err.message);
-          setLoading(false);
-        });
-    }
+    return () => controller.abort();
   }, [userLocation, searchTerm, priceRange, ratingRange, bookable]);
 
-  // Return the results, loading, and error states
-  return { results, loading, error };
-} 
\ No newline at end of file
+  // Fetch the next page of the current search and append it
+  const loadMore = useCallback(() => {
+    if (!nextCursor || loadingMore) return;
+    const controller = new AbortController();
+    loadMoreController.current = controller;
+    setLoadingMore(true);
+    fetch(`http://localhost:8000/api/recommend?${new URLSearchParams({ cursor: nextCursor }).toString()}`,
+      { signal: controller.signal })
+      .then((res) => {
+        if (!res.ok) throw new Error("Failed to fetch more recommendations");
+        return res.json();
+      })
+      .then((data) => {
+        setResults((previous) => [...previous, ...(data.results || [])]);
+        setNextCursor(data.next_cursor || null);
+      })
+      .catch((err) => {
+        // Aborted because a new search started, it has reset loadingMore already
+        if (err.name === "AbortError") return;
+        setError(err.message);
+      })
+      .finally(() => {
+        if (loadMoreController.current !== controller) return;
+        loadMoreController.current = null;
+        setLoadingMore(false);
+      });
+  }, [nextCursor, loadingMore]);
+
+  // Return the results, loading, refining and error states, and the next page loader
+  return { results, loading, refining, error, hasMore: Boolean(nextCursor), loadMore };
+}